@@ -0,0 +1,68 @@
+"""Score analytics for the admin dashboard.
+
+Works on the rows of DatabaseMan.fetch_candidate_scores, one per
+evaluated candidate, with whole-column pandas/NumPy operations: no
+per-candidate queries or Python loops.
+"""
+import numpy as np
+import pandas as pd
+
+from question_bank import position_key
+
+SCORE_COLUMNS = {
+    "technical_confidence_score": "Technical",
+    "communication_score": "Communication",
+    "conversation_authenticity_score": "Authenticity",
+}
+DEFAULT_WEIGHTS = {"Technical": 0.5, "Communication": 0.3, "Authenticity": 0.2}
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def score_frame(rows):
+    """DataFrame of candidate scores with a normalized Position column to group on."""
+    df = pd.DataFrame(rows, columns=["User ID", "Name", "Desired Designation", *SCORE_COLUMNS.values(),
+                                     "Sentiment", "Evaluated At"])
+    for column in SCORE_COLUMNS.values():
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df["Position"] = df["Desired Designation"].fillna("").map(position_key).replace("", "unspecified")
+    return df
+
+def position_summary(df):
+    """Candidate count, mean and percentiles of every score per position."""
+    grouped = df.groupby("Position")[list(SCORE_COLUMNS.values())]
+    summary = grouped.agg(["mean", *[_quantile(q) for q in PERCENTILES]])
+    summary.columns = [f"{score} {stat}" for score, stat in summary.columns]
+    summary.insert(0, "Candidates", df.groupby("Position").size())
+    return summary.round(1).sort_values("Candidates", ascending=False)
+
+def _quantile(q):
+    def quantile(series):
+        return series.quantile(q)
+    quantile.__name__ = f"p{int(q * 100)}"
+    return quantile
+
+def score_distribution(df, column):
+    """Number of candidates at each score from 0 to 10."""
+    counts = np.bincount(df[column].dropna().clip(0, 10).astype(int), minlength=11)
+    return pd.Series(counts, index=pd.RangeIndex(0, 11, name=column), name="Candidates")
+
+def rank_candidates(df, weights=None):
+    """Weighted composite score and rank within each position, best first.
+
+    Missing scores count as 0. Percentile is the share of the position's
+    candidates with a composite at or below this one.
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    columns = list(weights)
+    weight_vector = np.array([weights[column] for column in columns], dtype=float)
+    total = weight_vector.sum() or 1.0
+    scores = df[columns].fillna(0).to_numpy(dtype=float)
+    ranked = df.assign(Composite=np.round(scores @ weight_vector / total, 2))
+    by_position = ranked.groupby("Position")["Composite"]
+    ranked["Rank"] = by_position.rank(method="min", ascending=False).astype(int)
+    ranked["Percentile"] = (by_position.rank(method="max", pct=True) * 100).round().astype(int)
+    return ranked.sort_values(["Position", "Rank", "Name"])
+
+def shortlist(ranked, per_position=5):
+    """Candidates ranked in the top per_position of their position, ties included."""
+    return ranked[ranked["Rank"] <= per_position]
@@ -0,0 +1,259 @@
+"""Load test for the interview flow against a fake OpenAI server and a local Postgres.
+
+Each simulated candidate registers, saves a profile, goes through a number
+of interview turns, is evaluated and has the interview saved, making the
+same DatabaseMan calls as the Streamlit pages: start_interview, append_turn
+for every message and complete_interview at the end (inline evaluation). The report gives per-phase latency percentiles, DB
+operations per second, LLM calls per turn and the memory held per session.
+
+    sslmode=disable host=localhost database=bench user=postgres password=postgres port=5432 \\
+        python benchmark.py --candidates 20 --turns 8 --llm-latency 0.5
+
+With db_backend=sqlite no Postgres is needed at all.
+
+Benchmark users are named bench_<run>_<n> and deleted afterwards unless --keep is given.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import fake_openai
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def deep_size(obj, seen=None, skip=()):
+    """Approximate bytes reachable from obj, not counting objects in skip."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or any(obj is other for other in skip):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen, skip) + deep_size(v, seen, skip) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen, skip) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_size(vars(obj), seen, skip)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_size(getattr(obj, slot), seen, skip)
+                    for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+class Recorder:
+    """Thread-safe latency samples per phase plus LLM call counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self.turn_llm_calls = []
+        self.session_bytes = []
+        self.errors = defaultdict(int)
+
+    def timing(self, phase, seconds):
+        with self._lock:
+            self.latencies[phase].append(seconds)
+
+    def db_call(self, seconds):
+        with self._lock:
+            self.db_calls += 1
+            self.db_seconds += seconds
+
+    def add(self, name, value):
+        with self._lock:
+            getattr(self, name).append(value)
+
+    def error(self, phase, error):
+        with self._lock:
+            self.errors[f"{phase}: {type(error).__name__}"] += 1
+
+class CountingDatabase:
+    """Wraps DatabaseMan to count and time every call."""
+
+    def __init__(self, db_manager, recorder):
+        self._db_manager = db_manager
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attribute = getattr(self._db_manager, name)
+        if not callable(attribute) or name.startswith('_') or name in ('cursor', 'connection'):
+            return attribute
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                self._recorder.db_call(time.perf_counter() - started)
+        return timed
+
+class CountingClient:
+    """Looks like an OpenAI client to utils; counts completions made from the current thread."""
+
+    def __init__(self, client):
+        self._client = client
+        self._local = threading.local()
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self._local.calls = getattr(self._local, 'calls', 0) + 1
+        return self._client.chat.completions.create(**kwargs)
+
+    @property
+    def calls(self):
+        return getattr(self._local, 'calls', 0)
+
+CANDIDATE_ANSWERS = [
+    "I have mostly used it for building REST services with a layered architecture.",
+    "I would profile first, then look at indexes and query plans before touching the code.",
+    "We used feature flags and canary releases to reduce deployment risk.",
+    "I am not completely sure, but I think it uses a write-ahead log for durability.",
+]
+
+def simulate_candidate(index, run_id, db_manager, client, recorder, turns):
+    from hiring import HiringAssistant
+
+    def timed(phase, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            recorder.timing(phase, time.perf_counter() - started)
+
+    username = f"bench_{run_id}_{index}"
+    try:
+        user_id = timed("register", db_manager.register_user, username, "bench-password", "Candidate")
+        candidate = {
+            "full_name": f"Bench Candidate {index}",
+            "email": f"{username}@example.com",
+            "phone": "9999999999",
+            "education": "B.Tech",
+            "experience_years": 3,
+            "experience_months": 0,
+            "desired_position": "Backend Engineer",
+            "location": "Remote",
+            "tech_stack": ["Python", "PostgreSQL", "Docker"],
+            "consent_timestamp": None
+        }
+        timed("save_candidate", db_manager.save_candidate, user_id, candidate)
+        timed("collect_info_reads", lambda: (db_manager.get_candidate_info(user_id), db_manager.get_interviews(user_id)))
+
+        assistant = HiringAssistant(client, stream=False)
+        assistant.candidate_info = {key: candidate[key] for key in
+                                    ("experience_years", "experience_months", "desired_position", "tech_stack")}
+        timed("opening_question", assistant.get_opening_response)
+        transcript = assistant.conversation_history
+
+        def record_turns(interview_id, count):
+            # pages.record_turns
+            for seq in range(len(transcript) - count, len(transcript)):
+                db_manager.append_turn(interview_id, seq, transcript[seq].role, transcript[seq].content)
+
+        interview_id = timed("start_interview", db_manager.start_interview, user_id)
+        record_turns(interview_id, 1)
+
+        for turn in range(turns):
+            answer = CANDIDATE_ANSWERS[turn % len(CANDIDATE_ANSWERS)]
+            calls_before = client.calls
+            started = time.perf_counter()
+            assistant.get_next_response(answer)
+            record_turns(interview_id, 2)
+            assistant.should_end_interview()
+            recorder.timing("turn", time.perf_counter() - started)
+            recorder.add("turn_llm_calls", client.calls - calls_before)
+
+        # The UI renders the assistant's transcript, so the assistant is the whole session
+        recorder.add("session_bytes", deep_size(assistant, skip=(client,)))
+        sentiment = timed("analyze_sentiment", assistant.analyze_sentiment)
+        if timed("complete_interview", db_manager.complete_interview, interview_id, sentiment,
+                 transcript.to_dicts()) is None:
+            raise RuntimeError(f"Interview {interview_id} could not be completed")
+    except Exception as e:
+        recorder.error("candidate", e)
+
+def cleanup(db_manager, run_id):
+    with db_manager.cursor() as cursor:
+        cursor.execute("DELETE FROM users WHERE username LIKE %s ESCAPE '\\'", (f"bench\\_{run_id}\\_%",))
+
+def report(recorder, fake, elapsed, candidates):
+    lines = [f"{candidates} candidates in {elapsed:.1f}s"]
+    lines.append(f"{'phase':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for phase, samples in recorder.latencies.items():
+        lines.append(f"{phase:<20}{len(samples):>6}"
+                     + "".join(f"{percentile(samples, q) * 1000:>10.1f}" for q in (0.5, 0.95, 0.99)))
+    turn_calls = recorder.turn_llm_calls
+    lines.append(f"DB operations: {recorder.db_calls} ({recorder.db_calls / elapsed:.1f}/s, "
+                 f"{recorder.db_seconds:.2f}s total)")
+    lines.append(f"LLM calls per turn: {sum(turn_calls) / len(turn_calls):.2f}" if turn_calls else "LLM calls per turn: n/a")
+    lines.append(f"LLM requests served by fake server: {fake.requests} ({fake.rate_limited} rate limited)")
+    if recorder.session_bytes:
+        lines.append(f"Memory per session: {sum(recorder.session_bytes) / len(recorder.session_bytes) / 1024:.1f} KiB avg, "
+                     f"{max(recorder.session_bytes) / 1024:.1f} KiB max")
+    for error, count in recorder.errors.items():
+        lines.append(f"ERROR {error} x{count}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent interviews")
+    parser.add_argument("--candidates", type=int, default=10, help="concurrent simulated candidates")
+    parser.add_argument("--turns", type=int, default=6, help="interview turns per candidate")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake OpenAI latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-rpm", type=int, default=0, help="make the fake server answer 429 above this rate")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache on")
+    parser.add_argument("--keep", action="store_true", help="don't delete benchmark users afterwards")
+    parser.add_argument("--json", help="also write the raw samples to this file")
+    args = parser.parse_args()
+
+    fake = fake_openai.FakeOpenAI(args.llm_latency, args.llm_jitter, args.llm_rpm or None)
+    server = fake_openai.serve(fake, port=args.port)
+    # Read by the OpenAI SDK and by utils on first use
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    if not args.cache:
+        os.environ["llm_cache"] = "off"
+
+    import utils
+    from db_utils import open_database
+
+    recorder = Recorder()
+    db_manager = open_database()
+    database = CountingDatabase(db_manager, recorder)
+    client = CountingClient(utils.open_ai_config())
+    run_id = uuid.uuid4().hex[:8]
+
+    threads = [threading.Thread(target=simulate_candidate,
+                                args=(index, run_id, database, client, recorder, args.turns))
+               for index in range(args.candidates)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(report(recorder, fake, elapsed, args.candidates))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"elapsed": elapsed, "latencies": recorder.latencies, "db_calls": recorder.db_calls,
+                       "turn_llm_calls": recorder.turn_llm_calls, "session_bytes": recorder.session_bytes,
+                       "errors": recorder.errors}, f, indent=2)
+    if not args.keep:
+        cleanup(db_manager, run_id)
+    db_manager.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Bulk-register pre-registered candidates from a CSV file, e.g. for campus drives.
+
+Rows are checked with whole-column pandas operations that apply the same
+rules as the signup and candidate forms (utils.validate_inputs), passwords
+are hashed across the bcrypt worker pool, and all valid rows are inserted
+in one transaction. Rows that fail a check are skipped and listed, with
+the reason, in an error report.
+
+    python candidate_import.py drive.csv --errors drive_errors.csv
+    python candidate_import.py drive.csv --dry-run
+    python candidate_import.py drive.csv --keep-unrecognized
+
+Columns: username, password, full_name, email, phone, desired_position,
+location, tech_stack (comma-separated), and optionally education,
+experience_years and experience_months. As on the candidate form, rows whose
+tech stack has entries outside the skill taxonomy are rejected with
+suggestions unless --keep-unrecognized is given, which stores them as typed.
+Imported profiles have no consent_timestamp until the candidate agrees on
+the welcome page after signing in.
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+import skills
+from db_utils import open_database
+from passwords import get_hasher
+
+REQUIRED_COLUMNS = ["username", "password", "full_name", "email", "phone", "desired_position",
+                    "location", "tech_stack"]
+OPTIONAL_COLUMNS = ["education", "experience_years", "experience_months"]
+# Column sizes in the users and candidates tables
+MAX_LENGTHS = {"username": 50, "full_name": 100, "email": 100, "education": 50,
+               "desired_position": 50, "location": 100}
+
+
+def read_candidates(path):
+    """The CSV as strings with surrounding whitespace removed; missing optional columns are blank."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, skipinitialspace=True)
+    df.columns = [column.strip().lower() for column in df.columns]
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    for column in OPTIONAL_COLUMNS:
+        if column not in df.columns:
+            df[column] = ""
+    df = df[REQUIRED_COLUMNS + OPTIONAL_COLUMNS]
+    # Passwords are taken exactly as given
+    text_columns = [column for column in df.columns if column != "password"]
+    df[text_columns] = df[text_columns].apply(lambda column: column.str.strip())
+    return df
+
+def validate(df, taken_usernames=(), taken_emails=(), keep_unrecognized=False):
+    """(errors, df): an error message per row, '' for rows that can be imported, and df with
+    normalized tech stacks and integer experience.
+
+    The first failing check is reported, in the order validate_inputs checks them.
+    """
+    errors = pd.Series("", index=df.index)
+
+    def flag(mask, message):
+        target = mask & (errors == "")
+        errors[target] = message[target] if isinstance(message, pd.Series) else message
+
+    flag((df[REQUIRED_COLUMNS] == "").any(axis=1), "Please fill in all required fields.")
+    flag(~df["email"].str.match(r"[^@]+@[^@]+\.[^@]+"), "Invalid email address. Please enter a valid email.")
+    flag(~df["phone"].str.fullmatch(r"\d{10}"),
+         "Invalid phone number. Please enter a valid 10-digit phone number.")
+
+    # Drives repeat the same few stacks, so each distinct one is parsed once
+    parsed = {text: skills.parse_tech_stack(text) for text in df["tech_stack"].unique()}
+    stacks = df["tech_stack"].map(lambda text: parsed[text][0])
+    unrecognized = df["tech_stack"].map(lambda text: parsed[text][1])
+    rejected = df["tech_stack"].map(lambda text: parsed[text][2])
+    flag(rejected.str.len() > 0, rejected.map(
+        lambda entries: f"These don't look like skills: {', '.join(entries)}. "
+                        "Please list technologies separated by commas."))
+    if not keep_unrecognized:
+        index = skills.get_index()
+        flag(unrecognized.str.len() > 0, unrecognized.map(
+            lambda entries: f"We don't recognise: {index.describe_unrecognized(entries)}. "
+                            "Correct or remove them, or import with --keep-unrecognized."))
+    flag((stacks.str.len() == 0) & (unrecognized.str.len() == 0),
+         "Please list at least one technology in your tech stack.")
+
+    years = pd.to_numeric(df["experience_years"].replace("", "0"), errors="coerce")
+    months = pd.to_numeric(df["experience_months"].replace("", "0"), errors="coerce")
+    flag(years.isna() | (years < 0) | (years % 1 != 0), "Years of experience must be a whole number.")
+    flag(months.isna() | (months < 0) | (months > 11) | (months % 1 != 0),
+         "Months of experience must be a whole number from 0 to 11.")
+
+    for column, limit in MAX_LENGTHS.items():
+        flag(df[column].str.len() > limit, f"{column} is longer than {limit} characters.")
+
+    flag(df["username"].isin(taken_usernames), "Username already taken.")
+    flag(df["email"].isin(taken_emails), "A candidate with this email already exists.")
+    flag(df["username"].duplicated(), "Username appears earlier in the file.")
+    flag(df["email"].duplicated(), "Email appears earlier in the file.")
+
+    df = df.assign(tech_stack=stacks + unrecognized, experience_years=years.fillna(0).astype(int),
+                   experience_months=months.fillna(0).astype(int))
+    return errors, df
+
+def import_candidates(db_manager, df, hasher=None, dry_run=False, keep_unrecognized=False):
+    """Validate and insert df; returns (imported count, error report DataFrame)."""
+    taken_usernames, taken_emails = db_manager.existing_accounts(df["username"].unique(), df["email"].unique())
+    errors, df = validate(df, taken_usernames, taken_emails, keep_unrecognized)
+    report = pd.DataFrame({
+        # Line in the file, counting the header as line 1
+        "line": df.index + 2,
+        "username": df["username"],
+        "email": df["email"],
+        "error": errors
+    })[errors != ""]
+
+    valid = df[errors == ""]
+    if dry_run or valid.empty:
+        return 0, report
+
+    hashes = (hasher or get_hasher()).hash_many(valid["password"].tolist())
+    candidates = [
+        (row.username, password_hash, {
+            "full_name": row.full_name,
+            "email": row.email,
+            "phone": row.phone,
+            "education": row.education or None,
+            "experience_years": row.experience_years,
+            "experience_months": row.experience_months,
+            "desired_position": row.desired_position,
+            "location": row.location,
+            "tech_stack": row.tech_stack,
+        })
+        for row, password_hash in zip(valid.itertuples(index=False), hashes)
+    ]
+    db_manager.import_candidates(candidates)
+    return len(candidates), report
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-register candidates from a CSV file")
+    parser.add_argument("path", help="CSV file with a header row")
+    parser.add_argument("--errors", help="where to write rejected rows (default: <path>.errors.csv)")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, import nothing")
+    parser.add_argument("--keep-unrecognized", action="store_true",
+                        help="store tech stack entries outside the skill taxonomy as typed instead of rejecting the row")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        df = read_candidates(args.path)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Can't read {args.path}: {e}")
+
+    db_manager = open_database(maxconn=2)
+    try:
+        imported, report = import_candidates(db_manager, df, dry_run=args.dry_run,
+                                             keep_unrecognized=args.keep_unrecognized)
+    except Exception as e:
+        sys.exit(f"Import failed, nothing was imported: {type(e).__name__}: {e}")
+    finally:
+        db_manager.close()
+        get_hasher().shutdown()
+
+    if not report.empty:
+        errors_path = args.errors or f"{args.path}.errors.csv"
+        report.to_csv(errors_path, index=False)
+        print(f"{len(report)} rows rejected, see {errors_path}")
+    if args.dry_run:
+        print(f"{len(df) - len(report)} of {len(df)} rows would be imported")
+    else:
+        print(f"Imported {imported} of {len(df)} candidates in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Keeps the interviewer prompt bounded as an interview grows.
+
+The last few turns are sent verbatim; older turns are folded into a running
+summary and a list of covered topics, and the whole prompt is kept under a
+token budget counted locally.
+"""
+import json
+import logging
+import os
+from functools import lru_cache
+
+import utils
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text, model='gpt-4o-mini'):
+    """Number of tokens text takes up for model, without calling the API."""
+    if not text:
+        return 0
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    return len(_encoding(model).encode(text))
+
+def count_message_tokens(messages, model='gpt-4o-mini'):
+    # Each chat message carries a few tokens of framing on top of its content
+    return sum(count_tokens(msg["content"], model) + 4 for msg in messages) + 2
+
+NOTES_FUNCTION = {
+    "name": "update_interview_notes",
+    "description": "Update the running notes for an ongoing technical interview",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "summary": {
+                "type": "string",
+                "description": "Concise summary of the interview so far: questions asked, how the candidate answered, open threads"
+            },
+            "covered_topics": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Technologies and topics that have been sufficiently discussed"
+            }
+        },
+        "required": ["summary", "covered_topics"]
+    }
+}
+
+class ConversationContext:
+    def __init__(self, client, keep_turns=None, token_budget=None, model='gpt-4o-mini',
+                 summary_model=None, summary_tokens=400):
+        self.client = client
+        self.model = model
+        self.summary_model = summary_model or os.getenv('context_summary_model', 'gpt-4o-mini')
+        # One turn is an interviewer question plus the candidate's answer
+        self.keep_messages = 2 * int(keep_turns or os.getenv('context_keep_turns', 6))
+        self.token_budget = int(token_budget or os.getenv('context_token_budget', 4000))
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.covered_topics = []
+        self.summarized_upto = 0  # history messages already folded into the summary
+
+    def notes(self):
+        """The running notes, to carry the context over a hibernated session."""
+        return {"summary": self.summary, "covered_topics": self.covered_topics,
+                "summarized_upto": self.summarized_upto}
+
+    def restore(self, notes):
+        if not notes:
+            return
+        self.summary = notes.get("summary", "")
+        self.covered_topics = notes.get("covered_topics", [])
+        self.summarized_upto = notes.get("summarized_upto", 0)
+
+    def build(self, system_message, history):
+        """Prompt messages for the next turn: system prompt, notes, then recent turns."""
+        # Fold in batches of a couple of turns so the summariser doesn't run every turn
+        if len(history) - self.summarized_upto > self.keep_messages + 4:
+            self._compact(history, len(history) - self.keep_messages)
+
+        upto = self.summarized_upto
+        fixed = count_message_tokens([system_message], self.model) + self.summary_tokens
+        while (upto < len(history) - 2
+               and fixed + count_message_tokens(history[upto:], self.model) > self.token_budget):
+            upto += 1
+        if upto > self.summarized_upto:
+            self._compact(history, upto)
+
+        return self._assemble(system_message, history)
+
+    def _assemble(self, system_message, history):
+        messages = [system_message]
+        if self.summary:
+            notes = f"Summary of the interview so far: {self.summary}"
+            if self.covered_topics:
+                notes += f"\nTopics already covered: {', '.join(self.covered_topics)}"
+            messages.append({"role": "system", "content": notes})
+        messages.extend(dict(message) for message in history[self.summarized_upto:])
+        return messages
+
+    def _compact(self, history, upto):
+        """Fold history[summarized_upto:upto] into the running summary."""
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in history[self.summarized_upto:upto])
+        messages = [
+            {"role": "system", "content": "You keep concise running notes for a technical screening interview."},
+            {"role": "user", "content": (
+                f"Current summary: {self.summary or 'None yet.'}\n"
+                f"Topics covered so far: {', '.join(self.covered_topics) or 'None yet.'}\n\n"
+                f"New part of the conversation:\n{transcript}\n\n"
+                f"Update the notes. Keep the summary under {self.summary_tokens // 2} words."
+            )}
+        ]
+        try:
+            response = utils.generate_openai_response(self.client, messages, model=self.summary_model,
+                                                      functions=[NOTES_FUNCTION],
+                                                      function_call={"name": "update_interview_notes"},
+                                                      call_site='context_summary')
+        except utils.LLMError as e:
+            logger.warning("Could not update interview notes: %s", e)
+            return  # Keep the turns verbatim and try again next turn
+        if response.function_call is None:
+            return
+        try:
+            notes = json.loads(response.function_call.arguments)
+        except ValueError:
+            return
+        self.summary = notes.get("summary", self.summary)
+        self.covered_topics = notes.get("covered_topics", self.covered_topics)
+        self.summarized_upto = upto
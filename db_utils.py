@@ -2,121 +2,246 @@ import psycopg2
 from dotenv import load_dotenv
 import os
 import json
-import bcrypt
-from psycopg2.extras import Json
-import ast
+import logging
+import threading
+import time
+import datetime
+import copy
+import queue
+from contextlib import contextmanager
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+import metrics
+import migrations
+import skills
+from passwords import get_hasher
 
 
 # Load environment variables
 load_dotenv()
 
-def hash_password(password):
-    """Hash the password using bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+logger = logging.getLogger(__name__)
 
-def verify_password(password, hashed):
-    """Verify the provided password against the stored hash."""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+def connection_params():
+    """Connection settings for the Postgres server, read from the environment."""
+    return dict(
+        host=os.getenv('host'),
+        database=os.getenv('database'),
+        user=os.getenv('user'),
+        password=os.getenv('password'),
+        port=os.getenv('port'),
+        # Remote servers need TLS; a local Postgres for development or benchmarks may not offer it
+        sslmode=os.getenv('sslmode', 'require')
+    )
+
+def escape_like(text):
+    """Escape LIKE wildcards so user input matches literally."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class ReadCache:
+    """Per-user read cache with a TTL, invalidated explicitly on writes.
+
+    The TTL only bounds staleness from writes made by other processes.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, user_id):
+        """Return (hit, value); values are copied so callers can't mutate the cache."""
+        with self._lock:
+            entry = self._entries.get((namespace, user_id))
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        return True, copy.deepcopy(entry[1])
+
+    def set(self, namespace, user_id, value):
+        with self._lock:
+            self._entries[(namespace, user_id)] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+
+    def invalidate(self, user_id, *namespaces):
+        with self._lock:
+            for namespace in namespaces:
+                self._entries.pop((namespace, user_id), None)
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+class TurnWriter:
+    """Appends interview turns to interview_turns on a background thread.
+
+    Turns queued within flush_interval of each other are written in one
+    statement with synchronous_commit off, so recording a turn costs the
+    caller a queue put instead of a database round trip.
+    """
+
+    def __init__(self, db_manager, flush_interval=0.05, batch_size=200, attempts=3):
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.attempts = attempts
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._thread = None
+
+    def append(self, interview_id, seq, role, content):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="interview-turn-writer", daemon=True)
+                self._thread.start()
+            self._pending += 1
+        self._queue.put((interview_id, seq, role, content))
+
+    def flush(self, timeout=None):
+        """Wait until every queued turn is written; False if timeout ran out first."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self, timeout=5):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            turn = self._queue.get()
+            if turn is None:
+                break
+            batch = [turn]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    turn = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if turn is None:
+                    stopping = True
+                    break
+                batch.append(turn)
+            self._write(batch)
+            with self._cond:
+                self._pending -= len(batch)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                self.db_manager._write_turns(batch)
+                return
+            except Exception as e:
+                logger.warning("Error saving interview turns (attempt %d): %s", attempt, e)
+                if attempt < self.attempts:
+                    time.sleep(0.5 * attempt)
+        # complete_interview notices the missing turns and saves the in-memory transcript instead
+        logger.error("Dropped %d interview turns of interviews %s after %d attempts", len(batch),
+                     sorted({turn[0] for turn in batch}), self.attempts)
 
 class DatabaseMan:
-    def __init__(self):
+    def __init__(self, minconn=None, maxconn=None, checkout_timeout=None):
+        # Pool bounds and checkout timeout can be tuned per deployment
+        self.minconn = int(minconn or os.getenv('db_pool_min', 1))
+        self.maxconn = int(maxconn or os.getenv('db_pool_max', 10))
+        self.checkout_timeout = float(checkout_timeout or os.getenv('db_pool_timeout', 10))
         try:
-            self.conn = psycopg2.connect(
-                host=os.getenv('host'),
-                database=os.getenv('database'),
-                user=os.getenv('user'),
-                password=os.getenv('password'),
-                port=os.getenv('port'),
-                sslmode='require'
-            )
-            self.cursor = self.conn.cursor()
-            self.create_tables()
+            self.pool = ThreadedConnectionPool(self.minconn, self.maxconn, **connection_params())
+            # ThreadedConnectionPool raises once maxconn is reached; the semaphore
+            # makes callers wait for a free connection instead.
+            self._slots = threading.BoundedSemaphore(self.maxconn)
+            # Candidate profile and interview reads happen on every Streamlit rerun
+            self.read_cache = ReadCache(float(os.getenv('db_read_cache_ttl', 60)))
+            self._candidate_columns = None
+            # Started on the first appended turn; CLIs that never append don't get a thread
+            self.turn_writer = TurnWriter(self)
+            # Applies pending schema migrations; a single version check once up to date
+            migrations.migrate(self)
         except Exception as e:
             raise Exception(f"Database connection error: {e}")
-        
-    def ensure_connection(self):
-        if self.conn.closed:
-            self.conn = psycopg2.connect(
-                host=os.getenv('host'),
-                database=os.getenv('database'),
-                user=os.getenv('user'),
-                password=os.getenv('password'),
-                port=os.getenv('port'),
-                sslmode='require'
-            )
-        if self.cursor.closed:
-            self.cursor = self.conn.cursor()
-
-    def create_tables(self):
-        CREATE_USERS_TABLE = """
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            username VARCHAR(50) UNIQUE NOT NULL,
-            password VARCHAR(255) NOT NULL,
-            role VARCHAR(20) NOT NULL
-        );
-        """
-        CREATE_CANDIDATES_TABLE = """
-        CREATE TABLE IF NOT EXISTS candidates (
-            id SERIAL PRIMARY KEY,
-            user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-            full_name VARCHAR(100) NOT NULL,
-            email VARCHAR(100) UNIQUE NOT NULL,
-            phone VARCHAR(15),
-            education VARCHAR(50),
-            experience_years INT DEFAULT 0,
-            experience_months INT DEFAULT 0,
-            desired_position VARCHAR(50),
-            location VARCHAR(100),
-            tech_stack TEXT[],
-            consent_timestamp TIMESTAMP
-        );
-        """
-        CREATE_INTERVIEWS_TABLE = """
-        CREATE TABLE IF NOT EXISTS interviews (
-            id SERIAL PRIMARY KEY,
-            user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-            conversation_history JSONB,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
+
+    def _checkout(self):
+        """Take a connection from the pool, replacing it if it went stale."""
+        conn = self.pool.getconn()
+        try:
+            if conn.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return conn
+        except psycopg2.Error:
+            # Drop the broken connection; the pool opens a fresh one in its place
+            self.pool.putconn(conn, close=True)
+            return self.pool.getconn()
+
+    @contextmanager
+    def connection(self):
+        """Check out a pooled connection for the duration of one transaction.
+
+        Commits when the block succeeds, rolls back on error and always
+        returns the connection to the pool.
         """
-        self.cursor.execute(CREATE_USERS_TABLE)
-        self.cursor.execute(CREATE_CANDIDATES_TABLE)
-        self.cursor.execute(CREATE_INTERVIEWS_TABLE)
-        self.conn.commit()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.commit()
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self):
+        """Short-lived cursor on a pooled connection, committed on exit."""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                yield cursor
+
+    def close(self):
+        self.turn_writer.stop()
+        self.pool.closeall()
 
     def check_username_availability(self, username):
-        self.ensure_connection()
         query = """
         SELECT COUNT(*) FROM USERS WHERE username = %s
         """
-        self.cursor.execute(query, (username,))
-        count = self.cursor.fetchone()[0]
+        with self.cursor() as cursor:
+            cursor.execute(query, (username,))
+            count = cursor.fetchone()[0]
         return count == 0  # Return True if username does not exist
 
     def register_user(self, username, password, role):
-        self.ensure_connection()
-        hashed_password = hash_password(password)
+        # Hashed in the worker pool; raises PasswordPoolBusy when it is saturated
+        hashed_password = get_hasher().hash(password)
         query = """
         INSERT INTO users (username, password, role)
         VALUES (%s, %s, %s)
         RETURNING id
         """
-        self.cursor.execute(query, (username, hashed_password, role))
-        user_id = self.cursor.fetchone()[0]  # Retrieve the auto-generated user ID
-        self.conn.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, (username, hashed_password, role))
+            user_id = cursor.fetchone()[0]  # Retrieve the auto-generated user ID
         return user_id  # Return the user ID
     
     def login_user(self, username, password):
-        self.ensure_connection()
         """Verify the user credentials."""
         query = "SELECT password, role, id FROM users WHERE username = %s"
-        self.cursor.execute(query, (username,))
-        result = self.cursor.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(query, (username,))
+            result = cursor.fetchone()
         
         if result:
             stored_password, role, user_id = result
-            if verify_password(password, stored_password):
+            if get_hasher().verify(password, stored_password):
                 return True, role, user_id
             else:
                 return False, None, None
@@ -125,15 +250,24 @@ class DatabaseMan:
 
     def save_candidate(self, user_id, candidate_data):
 
-        self.ensure_connection()
         query = """
-        INSERT INTO candidates (user_id, full_name, email, phone, education, experience_years, experience_months, desired_position, location, tech_stack, consent_timestamp)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO candidates (user_id, full_name, email, phone, education, experience_years, experience_months, desired_position, location, tech_stack, consent_timestamp, skills)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id;
         """
 
-        # Prepare the values for insertion, including the user_id
-        values = (
+        # Execute the query; the transaction commits when the cursor block exits
+        with self.cursor() as cursor:
+            cursor.execute(query, self._candidate_values(user_id, candidate_data))
+            # Return the id of the newly created candidate
+            candidate_id = cursor.fetchone()[0]
+        self.read_cache.invalidate(user_id, 'candidate')
+        return candidate_id
+
+    @staticmethod
+    def _candidate_values(user_id, candidate_data):
+        """Values for an INSERT into candidates, in the column order save_candidate uses."""
+        return (
             user_id,  # Link the candidate to the user via user_id
             candidate_data['full_name'],
             candidate_data['email'],
@@ -144,29 +278,63 @@ class DatabaseMan:
             candidate_data.get('desired_position', None),
             candidate_data.get('location', None),
             candidate_data.get('tech_stack', []),
-            candidate_data.get('consent_timestamp', None)
+            candidate_data.get('consent_timestamp', None),
+            # Canonical skill names, for the admin skill filter
+            skills.get_index().known(candidate_data.get('tech_stack'))
         )
 
-        # Execute the query and commit the transaction
-        self.cursor.execute(query, values)
-        self.conn.commit()
+    def existing_accounts(self, usernames, emails):
+        """The usernames and candidate emails among the given ones that are already taken."""
+        with self.cursor() as cursor:
+            cursor.execute("SELECT username FROM users WHERE username = ANY(%s)", (list(usernames),))
+            taken_usernames = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT email FROM candidates WHERE email = ANY(%s)", (list(emails),))
+            taken_emails = {row[0] for row in cursor.fetchall()}
+        return taken_usernames, taken_emails
 
-        # Return the id of the newly created candidate
-        return self.cursor.fetchone()[0]  # This will return the newly inserted candidate's id
+    def import_candidates(self, candidates, role='Candidate'):
+        """Create users and their candidate profiles in one transaction.
+
+        candidates is [(username, password_hash, candidate_data)]. Returns the
+        new user ids in the same order; any failure rolls back the whole batch.
+        """
+        if not candidates:
+            return []
+        with self.cursor() as cursor:
+            rows = execute_values(cursor, """
+                INSERT INTO users (username, password, role) VALUES %s RETURNING id, username
+                """, [(username, password_hash, role) for username, password_hash, _ in candidates],
+                page_size=1000, fetch=True)
+            user_ids = {username: user_id for user_id, username in rows}
+            ids = [user_ids[username] for username, _, _ in candidates]
+            execute_values(cursor, """
+                INSERT INTO candidates (user_id, full_name, email, phone, education, experience_years, experience_months, desired_position, location, tech_stack, consent_timestamp, skills)
+                VALUES %s
+                """, [self._candidate_values(user_id, candidate_data)
+                      for user_id, (_, _, candidate_data) in zip(ids, candidates)],
+                page_size=1000)
+        return ids
+
+    def candidate_columns(self):
+        """Column names of the candidates table, looked up once per process."""
+        if self._candidate_columns is None:
+            with self.cursor() as cursor:
+                cursor.execute("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name = 'candidates'
+                """)
+                self._candidate_columns = [row[0] for row in cursor.fetchall()]
+        return self._candidate_columns
 
     def get_candidate_info(self, user_id):
         
-        self.ensure_connection()
         if not isinstance(user_id, int):
             raise ValueError(f"Invalid user_id: Expected an integer, got {type(user_id).__name__}")
 
-        # Fetch column names dynamically from the database
-        self.cursor.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'candidates'
-        """)
-        available_columns = [row[0] for row in self.cursor.fetchall()]
+        hit, user_info = self.read_cache.get('candidate', user_id)
+        if hit:
+            return user_info
 
         # Define the expected columns and their defaults
         default_columns = {
@@ -183,6 +351,7 @@ class DatabaseMan:
         }
 
         # Filter out columns that exist in the table
+        available_columns = self.candidate_columns()
         selected_columns = [col for col in default_columns if col in available_columns]
         column_query = ", ".join(selected_columns)
 
@@ -192,9 +361,11 @@ class DatabaseMan:
             FROM candidates
             WHERE user_id = %s
         """
-        self.cursor.execute(query, (user_id,))
-        result = self.cursor.fetchone()
+        with self.cursor() as cursor:
+            cursor.execute(query, (user_id,))
+            result = cursor.fetchone()
         if not result:
+            self.read_cache.set('candidate', user_id, False)
             return False
         user_info = default_columns.copy()
 
@@ -202,96 +373,519 @@ class DatabaseMan:
         # Map the result to the expected columns
             for col, val in zip(selected_columns, result):
                 user_info[col] = val
+        self.read_cache.set('candidate', user_id, user_info)
         return user_info
 
     def update_candidate_info(self, user_id, updated_info):
-        self.ensure_connection()
         query = """
         UPDATE candidates
         SET full_name = %s, email = %s, phone = %s, education = %s, 
-            experience_years = %s, experience_months=%s, desired_position = %s, location = %s, tech_stack = %s, consent_timestamp = %s
+            experience_years = %s, experience_months=%s, desired_position = %s, location = %s, tech_stack = %s, consent_timestamp = %s, skills = %s
         WHERE user_id = %s
         """
-        self.cursor.execute(
-            query,
-            (
-                updated_info["full_name"],
-                updated_info["email"],
-                updated_info["phone"],
-                updated_info["education"],
-                updated_info["experience_years"],
-                updated_info["experience_months"],
-                updated_info["desired_position"],
-                updated_info["location"],
-                updated_info["tech_stack"],  # TEXT[] type accepts Python lists directly
-                updated_info.get("consent_timestamp"),  # Include if you want to update the timestamp
-                user_id
+        with self.cursor() as cursor:
+            cursor.execute(
+                query,
+                (
+                    updated_info["full_name"],
+                    updated_info["email"],
+                    updated_info["phone"],
+                    updated_info["education"],
+                    updated_info["experience_years"],
+                    updated_info["experience_months"],
+                    updated_info["desired_position"],
+                    updated_info["location"],
+                    updated_info["tech_stack"],  # TEXT[] type accepts Python lists directly
+                    updated_info.get("consent_timestamp"),  # Include if you want to update the timestamp
+                    skills.get_index().known(updated_info["tech_stack"]),
+                    user_id
+                )
             )
-        )
-        self.conn.commit()
+        self.read_cache.invalidate(user_id, 'candidate')
+
+    def record_consent(self, user_id):
+        """Stamp consent on a profile saved without it, such as a bulk-imported one."""
+        query = """
+        UPDATE candidates SET consent_timestamp = CURRENT_TIMESTAMP
+        WHERE user_id = %s AND consent_timestamp IS NULL
+        """
+        with self.cursor() as cursor:
+            cursor.execute(query, (user_id,))
+            updated = cursor.rowcount
+        if updated:
+            self.read_cache.invalidate(user_id, 'candidate')
 
     def delete_candidate_info(self, user_id):
-        self.ensure_connection()
         query = "DELETE FROM candidates WHERE user_id = %s"
-        self.cursor.execute(query, (user_id,))
-        self.conn.commit()
+        with self.cursor() as cursor:
+            cursor.execute(query, (user_id,))
+        self.read_cache.invalidate(user_id, 'candidate')
+
+    def save_conversation_to_db(self, user_id, conversation_history, sentiment_data=None):
+        """Store a finished interview and return its id.
 
-    def save_conversation_to_db(self, user_id, conversation_history, sentiment_data):
+        Without sentiment_data the interview is queued for the evaluation worker.
+        """
         try:
             if isinstance(sentiment_data, str):
                 sentiment_data = json.loads(sentiment_data)
 
+            if sentiment_data is None:
+                insert_query = """
+                INSERT INTO interviews (user_id, conversation_history, evaluation_status)
+                VALUES (%s, %s, 'pending')
+                RETURNING id
+                """
+                with self.cursor() as cursor:
+                    cursor.execute(insert_query, (user_id, Json(conversation_history)))
+                    interview_id = cursor.fetchone()[0]
+                self.read_cache.invalidate(user_id, 'interviews')
+                return interview_id
+
             # Insert conversation history and evaluation data into the interviews table
             insert_query = """
             INSERT INTO interviews (user_id, conversation_history, overall_sentiment, key_strengths, 
                                 areas_for_improvement, technical_confidence_score, 
                                 conversation_authenticity_score, communication_score)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
             """
             
-            self.cursor.execute(insert_query, (
-                user_id, 
-                Json(conversation_history),
+            with self.cursor() as cursor:
+                cursor.execute(insert_query, (
+                    user_id, 
+                    Json(conversation_history),
+                    sentiment_data.get('overall_sentiment'),
+                    Json(sentiment_data.get('key_strengths')),
+                    Json(sentiment_data.get('areas_for_improvement')),
+                    sentiment_data.get('technical_confidence_score'),
+                    sentiment_data.get('conversation_authenticity_score'),
+                    sentiment_data.get('communication_score')
+                ))
+                interview_id = cursor.fetchone()[0]
+                self._refresh_candidate_scores(cursor, [interview_id])
+            self.read_cache.invalidate(user_id, 'interviews')
+            return interview_id
+        except Exception:
+            # The pooled connection has already been rolled back
+            logger.exception("Error saving the conversation of user %s", user_id)
+            return None
+
+    def start_interview(self, user_id):
+        """Open an interview whose turns are appended as they happen; returns its id.
+
+        Any interview the user left open is marked abandoned. Returns None
+        when the row can't be created, in which case the caller falls back
+        to save_conversation_to_db at the end.
+        """
+        try:
+            with self.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE interviews SET evaluation_status = 'abandoned'
+                    WHERE user_id = %s AND evaluation_status = 'in_progress'
+                    """, (user_id,))
+                cursor.execute("""
+                    INSERT INTO interviews (user_id, evaluation_status)
+                    VALUES (%s, 'in_progress')
+                    RETURNING id
+                    """, (user_id,))
+                return cursor.fetchone()[0]
+        except Exception:
+            logger.exception("Error starting an interview for user %s", user_id)
+            return None
+
+    def append_turn(self, interview_id, seq, role, content):
+        """Queue one transcript message; seq is its position in the conversation."""
+        self.turn_writer.append(interview_id, seq, role, content)
+
+    def _write_turns(self, turns):
+        with self.cursor() as cursor:
+            # A crash of Postgres itself may lose the last few hundred ms of turns;
+            # the transcript is rebuilt from whatever made it
+            cursor.execute("SET LOCAL synchronous_commit = off")
+            execute_values(cursor, """
+                INSERT INTO interview_turns (interview_id, seq, role, content) VALUES %s
+                ON CONFLICT (interview_id, seq) DO NOTHING
+                """, turns, page_size=len(turns))
+
+    def get_open_interview(self, user_id):
+        """(interview_id, messages) of the user's in-progress interview, or None."""
+        query = """
+        SELECT i.id, t.role, t.content
+        FROM (
+            SELECT id FROM interviews
+            WHERE user_id = %s AND evaluation_status = 'in_progress'
+            ORDER BY id DESC
+            LIMIT 1
+        ) i
+        LEFT JOIN interview_turns t ON t.interview_id = i.id
+        ORDER BY t.seq
+        """
+        # Turns still queued for this process would otherwise be missed
+        self.turn_writer.flush(timeout=self.checkout_timeout)
+        with self.cursor() as cursor:
+            cursor.execute(query, (user_id,))
+            rows = cursor.fetchall()
+        if not rows:
+            return None
+        return rows[0][0], [{"role": role, "content": content} for _, role, content in rows if role]
+
+    def save_context_notes(self, interview_id, notes):
+        """Keep the interviewer's running notes of an open interview whose session is hibernated."""
+        with self.cursor() as cursor:
+            cursor.execute("UPDATE interviews SET context_notes = %s WHERE id = %s", (Json(notes), interview_id))
+
+    def get_context_notes(self, interview_id):
+        with self.cursor() as cursor:
+            cursor.execute("SELECT context_notes FROM interviews WHERE id = %s", (interview_id,))
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # conversation_history rebuilt from interview_turns; takes the interview id
+    TRANSCRIPT_FROM_TURNS = """
+        COALESCE((SELECT jsonb_agg(jsonb_build_object('role', role, 'content', content) ORDER BY seq)
+                  FROM interview_turns WHERE interview_id = %s), '[]'::jsonb)
+    """
+
+    def complete_interview(self, interview_id, sentiment_data=None, transcript=None):
+        """Close an interview started with start_interview and return its id.
+
+        The transcript is normally assembled from interview_turns inside the
+        database, so nothing but the status change is sent. transcript, the
+        caller's in-memory copy, is stored instead when queued turns could
+        not all be written. Without sentiment_data the interview is queued
+        for the evaluation worker.
+        """
+        flushed = self.turn_writer.flush(timeout=self.checkout_timeout)
+        if isinstance(sentiment_data, str):
+            sentiment_data = json.loads(sentiment_data)
+        try:
+            with self.cursor() as cursor:
+                history, history_params = self.TRANSCRIPT_FROM_TURNS, (interview_id,)
+                if transcript is not None:
+                    cursor.execute("SELECT COUNT(*) FROM interview_turns WHERE interview_id = %s", (interview_id,))
+                    stored = cursor.fetchone()[0]
+                    if not flushed or stored != len(transcript):
+                        logger.warning("Interview %s has %d of %d turns stored%s; saving the in-memory transcript",
+                                       interview_id, stored, len(transcript), "" if flushed else " (flush timed out)")
+                        history, history_params = "%s", (Json(transcript),)
+                query, params = self._complete_interview_query(interview_id, sentiment_data, history, history_params)
+                cursor.execute(query, params)
+                row = cursor.fetchone()
+                if sentiment_data is not None:
+                    self._refresh_candidate_scores(cursor, [interview_id])
+        except Exception as e:
+            logger.error("Error completing interview %s: %s", interview_id, e)
+            return None
+        if row is None:
+            return None
+        self.read_cache.invalidate(row[0], 'interviews')
+        return interview_id
+
+    def _complete_interview_query(self, interview_id, sentiment_data, transcript, transcript_params):
+        """UPDATE closing the interview; transcript is the SQL for conversation_history."""
+        if sentiment_data is None:
+            query = f"""
+            UPDATE interviews
+            SET conversation_history = {transcript},
+                evaluation_status = 'pending', evaluation_available_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND evaluation_status = 'in_progress'
+            RETURNING user_id
+            """
+            return query, (*transcript_params, interview_id)
+        query = f"""
+        UPDATE interviews
+        SET conversation_history = {transcript},
+            overall_sentiment = %s, key_strengths = %s, areas_for_improvement = %s,
+            technical_confidence_score = %s, conversation_authenticity_score = %s,
+            communication_score = %s, evaluation_status = 'done'
+        WHERE id = %s AND evaluation_status = 'in_progress'
+        RETURNING user_id
+        """
+        return query, (
+            *transcript_params,
+            sentiment_data.get('overall_sentiment'),
+            Json(sentiment_data.get('key_strengths')),
+            Json(sentiment_data.get('areas_for_improvement')),
+            sentiment_data.get('technical_confidence_score'),
+            sentiment_data.get('conversation_authenticity_score'),
+            sentiment_data.get('communication_score'),
+            interview_id
+        )
+
+    # Expired leases that have used up their attempts; the worker died during every one of them
+    ABANDON_EXHAUSTED_QUERY = """
+    UPDATE interviews
+    SET evaluation_status = 'failed',
+        evaluation_error = 'Evaluation did not finish in ' || evaluation_attempts || ' attempts'
+    WHERE evaluation_status = 'running'
+      AND evaluation_started_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+      AND evaluation_attempts >= %s
+    """
+
+    def claim_evaluation(self, lease_seconds=600, max_running=None, max_attempts=None):
+        """Lock the next pending interview for evaluation.
+
+        Interviews left 'running' longer than lease_seconds belong to a worker
+        that died and are picked up again, unless they have already been tried
+        max_attempts times: those are marked failed so a job that kills its
+        worker is not retried forever. Returns (interview_id, user_id,
+        conversation_history, attempts) or None when there is nothing to do
+        or max_running evaluations are already in flight.
+        """
+        claim_query = """
+        UPDATE interviews
+        SET evaluation_status = 'running',
+            evaluation_attempts = evaluation_attempts + 1,
+            evaluation_started_at = CURRENT_TIMESTAMP
+        WHERE id = (
+            SELECT id FROM interviews
+            WHERE (evaluation_status = 'pending' AND evaluation_available_at <= CURRENT_TIMESTAMP)
+               OR (evaluation_status = 'running'
+                   AND evaluation_started_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+            ORDER BY id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING id, user_id, conversation_history, evaluation_attempts
+        """
+        with self.cursor() as cursor:
+            if max_attempts:
+                cursor.execute(self.ABANDON_EXHAUSTED_QUERY, (lease_seconds, max_attempts))
+            if max_running:
+                # Serialise claims so the running count can't be raced past the limit
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext('interview_evaluation_claim'))")
+                cursor.execute("""
+                    SELECT COUNT(*) FROM interviews
+                    WHERE evaluation_status = 'running'
+                      AND evaluation_started_at >= CURRENT_TIMESTAMP - make_interval(secs => %s)
+                """, (lease_seconds,))
+                if cursor.fetchone()[0] >= max_running:
+                    return None
+            cursor.execute(claim_query, (lease_seconds,))
+            return cursor.fetchone()
+
+    def save_evaluation(self, interview_id, sentiment_data):
+        """Store the worker's analysis and mark the interview evaluated."""
+        query = """
+        UPDATE interviews
+        SET overall_sentiment = %s, key_strengths = %s, areas_for_improvement = %s,
+            technical_confidence_score = %s, conversation_authenticity_score = %s,
+            communication_score = %s, evaluation_status = 'done', evaluation_error = NULL
+        WHERE id = %s
+        """
+        with self.cursor() as cursor:
+            cursor.execute(query, (
                 sentiment_data.get('overall_sentiment'),
-                sentiment_data.get('key_strengths'),
-                sentiment_data.get('areas_for_improvement'),
+                Json(sentiment_data.get('key_strengths')),
+                Json(sentiment_data.get('areas_for_improvement')),
                 sentiment_data.get('technical_confidence_score'),
                 sentiment_data.get('conversation_authenticity_score'),
-                sentiment_data.get('communication_score')
+                sentiment_data.get('communication_score'),
+                interview_id
             ))
-            
-            # Commit the transaction
-            self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-        finally:
-            self.cursor.close()
-            self.conn.close()
+            self._refresh_candidate_scores(cursor, [interview_id])
+
+    def _refresh_candidate_scores(self, cursor, interview_ids):
+        """Bring candidate_scores up to date after evaluations of interview_ids were stored.
+
+        Runs in the caller's transaction. Each candidate keeps the scores of
+        their latest evaluated interview.
+        """
+        if not interview_ids:
+            return
+        cursor.execute(f"""
+            INSERT INTO candidate_scores (user_id, interview_id, technical_confidence_score,
+                                          communication_score, conversation_authenticity_score,
+                                          overall_sentiment, evaluated_at)
+            SELECT user_id, id, technical_confidence_score, communication_score,
+                   conversation_authenticity_score, overall_sentiment, CURRENT_TIMESTAMP
+            FROM interviews
+            WHERE id IN (SELECT MAX(id) FROM interviews
+                         WHERE id IN ({', '.join(['%s'] * len(interview_ids))}) AND evaluation_status = 'done'
+                         GROUP BY user_id)
+            ON CONFLICT (user_id) DO UPDATE SET
+                interview_id = EXCLUDED.interview_id,
+                technical_confidence_score = EXCLUDED.technical_confidence_score,
+                communication_score = EXCLUDED.communication_score,
+                conversation_authenticity_score = EXCLUDED.conversation_authenticity_score,
+                overall_sentiment = EXCLUDED.overall_sentiment,
+                evaluated_at = EXCLUDED.evaluated_at
+            WHERE EXCLUDED.interview_id >= candidate_scores.interview_id
+            """, list(interview_ids))
+
+    def fetch_candidate_scores(self, position=None):
+        """(user_id, full_name, desired_position, technical, communication, authenticity,
+        overall_sentiment, evaluated_at) for every evaluated candidate, from candidate_scores."""
+        conditions, params = [], []
+        if position:
+            conditions.append("c.desired_position ILIKE %s")
+            params.append(f"%{escape_like(position)}%")
+        query = f"""
+        SELECT s.user_id, c.full_name, c.desired_position, s.technical_confidence_score,
+               s.communication_score, s.conversation_authenticity_score,
+               s.overall_sentiment, s.evaluated_at
+        FROM candidate_scores s
+        JOIN candidates c ON c.user_id = s.user_id
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        """
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def iter_interviews(self, after_id=0, statuses=None, batch_size=500):
+        """Stream (id, user_id, conversation_history) in id order through a server-side cursor.
+
+        Only batch_size rows are held in memory at a time. The pooled
+        connection stays checked out until the generator is exhausted or closed.
+        """
+        conditions = ["id > %s", "conversation_history IS NOT NULL"]
+        params = [after_id]
+        if statuses:
+            conditions.append("evaluation_status = ANY(%s)")
+            params.append(list(statuses))
+        query = f"""
+        SELECT id, user_id, conversation_history
+        FROM interviews
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id
+        """
+        with self.connection() as conn:
+            with conn.cursor(name=f"interviews_stream_{threading.get_ident()}") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield row
+
+    EXPORT_COLUMNS = [
+        "candidate_id", "user_id", "full_name", "email", "phone", "education", "experience_years",
+        "experience_months", "desired_position", "location", "tech_stack", "skills", "consent_timestamp",
+        "interview_id", "interviewed_at", "evaluation_status", "overall_sentiment",
+        "technical_confidence_score", "communication_score", "conversation_authenticity_score",
+        "key_strengths", "areas_for_improvement"
+    ]
+
+    def export_query(self, since=None, until=None, include_transcripts=False):
+        """(columns, query, params) for one row per interview joined to its candidate, in candidate order.
+
+        since and until are dates; the range includes both ends and limits
+        the interviews only. Candidates without an interview in it get one
+        row with the interview columns empty.
+        """
+        columns = list(self.EXPORT_COLUMNS)
+        select = """
+            c.id, c.user_id, c.full_name, c.email, c.phone, c.education, c.experience_years,
+            c.experience_months, c.desired_position, c.location, c.tech_stack, c.skills, c.consent_timestamp,
+            i.id, i.timestamp, i.evaluation_status, i.overall_sentiment,
+            i.technical_confidence_score, i.communication_score, i.conversation_authenticity_score,
+            i.key_strengths, i.areas_for_improvement"""
+        if include_transcripts:
+            columns.append("transcript")
+            select += ", i.conversation_history"
+        conditions, params = ["i.user_id = c.user_id"], []
+        if since:
+            conditions.append("i.timestamp >= %s")
+            params.append(since.isoformat())
+        if until:
+            conditions.append("i.timestamp < %s")
+            params.append((until + datetime.timedelta(days=1)).isoformat())
+        query = f"""
+        SELECT {select}
+        FROM candidates c
+        LEFT JOIN interviews i ON {' AND '.join(conditions)}
+        ORDER BY c.id, i.id
+        """
+        return columns, query, params
+
+    def iter_batches(self, query, params=(), batch_size=1000):
+        """Yield the result of query in lists of at most batch_size rows through a server-side cursor.
+
+        Memory use stays at one batch however large the result. The pooled
+        connection stays checked out until the generator is exhausted or closed.
+        """
+        with self.connection() as conn:
+            with conn.cursor(name=f"batches_{threading.get_ident()}") as cursor:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    def save_evaluations(self, evaluations):
+        """Write many evaluations in one statement; evaluations is [(interview_id, sentiment_data)]."""
+        if not evaluations:
+            return
+        rows = [(
+            interview_id,
+            sentiment_data.get('overall_sentiment'),
+            Json(sentiment_data.get('key_strengths')),
+            Json(sentiment_data.get('areas_for_improvement')),
+            sentiment_data.get('technical_confidence_score'),
+            sentiment_data.get('conversation_authenticity_score'),
+            sentiment_data.get('communication_score')
+        ) for interview_id, sentiment_data in evaluations]
+        query = """
+        UPDATE interviews AS i
+        SET overall_sentiment = v.overall_sentiment,
+            key_strengths = v.key_strengths::jsonb,
+            areas_for_improvement = v.areas_for_improvement::jsonb,
+            technical_confidence_score = v.technical_confidence_score::int,
+            conversation_authenticity_score = v.conversation_authenticity_score::int,
+            communication_score = v.communication_score::int,
+            evaluation_status = 'done',
+            evaluation_error = NULL
+        FROM (VALUES %s) AS v (id, overall_sentiment, key_strengths, areas_for_improvement,
+                               technical_confidence_score, conversation_authenticity_score,
+                               communication_score)
+        WHERE i.id = v.id
+        """
+        with self.cursor() as cursor:
+            execute_values(cursor, query, rows, page_size=len(rows))
+            self._refresh_candidate_scores(cursor, [interview_id for interview_id, _ in evaluations])
+
+    def fail_evaluation(self, interview_id, error, retry_in=None):
+        """Record a failed attempt; requeue after retry_in seconds or give up when it is None."""
+        if retry_in is None:
+            query = """
+            UPDATE interviews SET evaluation_status = 'failed', evaluation_error = %s
+            WHERE id = %s
+            """
+            params = (error, interview_id)
+        else:
+            query = """
+            UPDATE interviews
+            SET evaluation_status = 'pending', evaluation_error = %s,
+                evaluation_available_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE id = %s
+            """
+            params = (error, retry_in, interview_id)
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
     
     def get_interviews(self, user_id):
-        self.ensure_connection()
+        hit, conversation = self.read_cache.get('interviews', user_id)
+        if hit:
+            return conversation
         try:
             query = """
             SELECT conversation_history 
             FROM interviews 
-            WHERE user_id = %s
+            WHERE user_id = %s AND conversation_history IS NOT NULL
             """
-            self.cursor.execute(query, (user_id,))
-            result = self.cursor.fetchone()
+            with self.cursor() as cursor:
+                cursor.execute(query, (user_id,))
+                result = cursor.fetchone()
             
-            if result and result[0]:  # If a conversation history exists
-                return result[0]  # Assuming JSON format in DB
-            
-            return False  # No conversation found
-        except Exception as e:
-            print(f"Error checking conversation: {e}")
+            # conversation_history if one exists (JSON in the DB), otherwise False
+            conversation = result[0] if result and result[0] else False
+            self.read_cache.set('interviews', user_id, conversation)
+            return conversation
+        except Exception:
+            logger.exception("Error loading the interviews of user %s", user_id)
             return False
-        finally:
-            self.cursor.close()
-            self.conn.close()
               
     def fetch_user_table(self):
-        self.ensure_connection()
         query = """
         SELECT 
             c.full_name, 
@@ -306,30 +900,222 @@ class DatabaseMan:
         WHERE 
             u.role = 'Candidate';
     """
-        self.cursor.execute(query)
-        rows = self.cursor.fetchall()
-        self.conn.close()
+        with self.cursor() as cursor:
+            cursor.execute(query)
+            rows = cursor.fetchall()
         return rows
     
-    def fetch_interview_evaluation(self, user_id):
-        self.ensure_connection()
+    # Sortable columns of the admin candidate table; NULL positions sort as ''
+    # so the keyset comparison below never sees a NULL
+    USER_PAGE_SORT_COLUMNS = {
+        "full_name": "c.full_name",
+        "desired_position": "COALESCE(c.desired_position, '')",
+        "user_id": "u.id"
+    }
+
+    def fetch_user_page(self, name=None, position=None, role='Candidate', sort_by='full_name',
+                        descending=False, after=None, limit=25, skills=None):
+        """One page of the candidate table using keyset pagination.
+
+        skills keeps candidates having every one of the given canonical
+        skill names. after is the cursor returned with the previous page. Returns
+        (rows, next_cursor) where rows are (full_name, desired_position, user_id,
+        overall_sentiment, technical_confidence_score, communication_score,
+        conversation_authenticity_score, evaluation_status) and next_cursor is
+        None on the last page.
+        """
+        if sort_by not in self.USER_PAGE_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort candidates by {sort_by}")
+        sort_column = self.USER_PAGE_SORT_COLUMNS[sort_by]
+        direction = "DESC" if descending else "ASC"
+
+        conditions, params = [], []
+        if role:
+            conditions.append("u.role = %s")
+            params.append(role)
+        if name:
+            conditions.append("c.full_name ILIKE %s")
+            params.append(f"%{escape_like(name)}%")
+        if position:
+            conditions.append("c.desired_position ILIKE %s")
+            params.append(f"%{escape_like(position)}%")
+        if skills:
+            # Served by the GIN index on candidates.skills
+            conditions.append("c.skills @> %s::text[]")
+            params.append(list(skills))
+        if after is not None:
+            conditions.append(f"({sort_column}, u.id) {'<' if descending else '>'} (%s, %s)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # Fetch one extra row to learn whether another page follows; the
+        # lateral join brings in each candidate's latest evaluation
+        query = f"""
+        SELECT c.full_name, c.desired_position, u.id,
+               i.overall_sentiment, i.technical_confidence_score, i.communication_score,
+               i.conversation_authenticity_score, i.evaluation_status,
+               {sort_column}
+        FROM candidates c
+        JOIN users u ON c.user_id = u.id
+        LEFT JOIN LATERAL (
+            SELECT overall_sentiment, technical_confidence_score, communication_score,
+                   conversation_authenticity_score, evaluation_status
+            FROM interviews
+            WHERE interviews.user_id = u.id
+            ORDER BY id DESC
+            LIMIT 1
+        ) i ON TRUE
+        {where}
+        ORDER BY {sort_column} {direction}, u.id {direction}
+        LIMIT %s
+        """
+        params.append(limit + 1)
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][-1], rows[-1][2])
+        return [row[:-1] for row in rows], next_cursor
+    
+    def fetch_interview_evaluations(self, user_ids):
+        """Evaluations of the latest interview of each user, in one query.
+
+        Returns {user_id: evaluation}; users without an interview are left out.
+        """
+        if not user_ids:
+            return {}
         query = """
-            SELECT overall_sentiment, key_strengths, technical_confidence_score, conversation_authenticity_score, communication_score, areas_for_improvement
-            FROM interviews 
-            WHERE user_id = %s
+            SELECT DISTINCT ON (user_id)
+                   user_id, overall_sentiment, key_strengths, technical_confidence_score,
+                   conversation_authenticity_score, communication_score, areas_for_improvement,
+                   evaluation_status, evaluation_error
+            FROM interviews
+            WHERE user_id = ANY(%s)
+            ORDER BY user_id, id DESC
             """
-        self.cursor.execute(query, (user_id,))
-        result = self.cursor.fetchone()
-        
-        if result:
-            return {
-            "Overall Sentiment": result[0],
-            "Key Strengths": ast.literal_eval(result[1]) if result[1] else None,
-            "Technical Confidence Score": result[2],
-            "Conversation Authenticity Score": result[3] if result[3] is not None else "Not Evaluated",
-            "Communication Score": result[4],
-            "Areas for Improvement": ast.literal_eval(result[5]) if result[5] else None
+        with self.cursor() as cursor:
+            cursor.execute(query, (list(user_ids),))
+            rows = cursor.fetchall()
+
+        # key_strengths and areas_for_improvement are JSONB and come back as lists
+        return {
+            row[0]: {
+            "Overall Sentiment": row[1],
+            "Key Strengths": row[2],
+            "Technical Confidence Score": row[3],
+            "Conversation Authenticity Score": row[4] if row[4] is not None else "Not Evaluated",
+            "Communication Score": row[5],
+            "Areas for Improvement": row[6],
+            "Evaluation Status": row[7],
+            "Evaluation Error": row[8]
             }
-        else:
-            return False
-    
\ No newline at end of file
+            for row in rows
+        }
+
+    def fetch_interview_evaluation(self, user_id):
+        return self.fetch_interview_evaluations([user_id]).get(user_id, False)
+
+    def search_interviews(self, query, after=None, limit=20):
+        """Interviews whose transcript matches query, best match first.
+
+        query takes web search syntax ("quoted phrase", or, -word). after is
+        the cursor returned with the previous page. Returns (rows,
+        next_cursor) where rows are (interview_id, user_id, full_name,
+        desired_position, rank, snippet) and matches in the snippet are
+        wrapped in ** for markdown.
+        """
+        conditions, params = ["i.search_vector @@ q.query"], [query]
+        if after is not None:
+            # rank is a real; compare as one so the cursor round-trips exactly
+            conditions.append("(ts_rank_cd(i.search_vector, q.query), i.id) < (%s::real, %s)")
+            params.extend(after)
+        params.append(limit + 1)
+
+        # Headlines are only built for the page being returned
+        sql = f"""
+        WITH q AS (SELECT websearch_to_tsquery('english', %s) AS query),
+        hits AS (
+            SELECT i.id, i.user_id, ts_rank_cd(i.search_vector, q.query) AS rank
+            FROM interviews i, q
+            WHERE {' AND '.join(conditions)}
+            ORDER BY rank DESC, i.id DESC
+            LIMIT %s
+        )
+        SELECT h.id, h.user_id, c.full_name, c.desired_position, h.rank,
+               ts_headline('english',
+                           (SELECT string_agg(turn->>'content', ' ... ')
+                            FROM jsonb_array_elements(i.conversation_history) turn),
+                           q.query, 'StartSel=**, StopSel=**, MaxFragments=2, MaxWords=20, MinWords=8')
+        FROM hits h
+        JOIN interviews i ON i.id = h.id
+        CROSS JOIN q
+        LEFT JOIN candidates c ON c.user_id = h.user_id
+        ORDER BY h.rank DESC, h.id DESC
+        """
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][4], rows[-1][0])
+        return rows, next_cursor
+
+    def load_question_bank(self):
+        """Every banked opener as (position_key, skill, experience_bucket, opener, generated_at)."""
+        with self.cursor() as cursor:
+            cursor.execute("""
+                SELECT position_key, skill, experience_bucket, opener, generated_at
+                FROM question_bank
+                """)
+            return cursor.fetchall()
+
+    def save_question(self, position_key, skill, experience_bucket, position_label, opener, generated_at):
+        query = """
+        INSERT INTO question_bank (position_key, skill, experience_bucket, position_label, opener, generated_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (position_key, skill, experience_bucket) DO UPDATE SET
+            position_label = EXCLUDED.position_label,
+            opener = EXCLUDED.opener,
+            generated_at = EXCLUDED.generated_at
+        """
+        with self.cursor() as cursor:
+            cursor.execute(query, (position_key, skill, experience_bucket, position_label, opener, generated_at))
+
+    def save_interview_metrics(self, interview_id, user_id, totals):
+        """Add the LLM and DB totals gathered by metrics to the interview's row."""
+        if interview_id is None or not totals:
+            return
+        columns = ("llm_calls", "llm_seconds", "prompt_tokens", "completion_tokens",
+                   "cache_hits", "db_calls", "db_seconds")
+        query = f"""
+            INSERT INTO interview_metrics (interview_id, user_id, {", ".join(columns)})
+            VALUES (%s, %s, {", ".join(["%s"] * len(columns))})
+            ON CONFLICT (interview_id) DO UPDATE SET
+                {", ".join(f"{column} = interview_metrics.{column} + EXCLUDED.{column}" for column in columns)},
+                updated_at = CURRENT_TIMESTAMP
+            """
+        with self.cursor() as cursor:
+            cursor.execute(query, (interview_id, user_id, *(totals.get(column, 0) for column in columns)))
+
+def open_database(backend=None, **kwargs):
+    """DatabaseMan for the configured backend, 'postgres' (default) or 'sqlite'.
+
+    The SQLite backend keeps everything in a local file (env sqlite_path)
+    for single-node deployments, tests and benchmarks.
+    """
+    backend = (backend or os.getenv('db_backend', 'postgres')).lower()
+    if backend == 'sqlite':
+        from sqlite_backend import SQLiteDatabaseMan
+        return SQLiteDatabaseMan(**kwargs)
+    if backend != 'postgres':
+        raise ValueError(f"Unknown db_backend: {backend}")
+    return DatabaseMan(**kwargs)
+
+# Every query method is timed; the pool plumbing is not, and saving the
+# totals must not start a new tally for the user it just stored
+metrics.instrument_methods(DatabaseMan, skip=('connection', 'cursor', 'close', 'save_interview_metrics'))
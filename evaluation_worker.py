@@ -0,0 +1,90 @@
+"""Background worker that runs sentiment analysis for saved interviews.
+
+Interviews are queued in the interviews table by save_conversation_to_db.
+Run one or more workers next to the Streamlit app:
+
+    python evaluation_worker.py --concurrency 2
+"""
+import argparse
+import os
+import random
+import threading
+import traceback
+
+import metrics
+import utils
+from db_utils import open_database
+from hiring import HiringAssistant
+
+
+def retry_delay(attempts, base=30, cap=1800):
+    """Exponential backoff with jitter, in seconds."""
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+def evaluate(db_manager, client, job, max_attempts):
+    interview_id, user_id, conversation_history, attempts = job
+    assistant = HiringAssistant(client)
+    assistant.conversation_history = conversation_history or []
+    metrics.set_user(user_id)
+    try:
+        sentiment_data = assistant.analyze_sentiment()
+        db_manager.save_evaluation(interview_id, sentiment_data)
+        print(f"Evaluated interview {interview_id} for user {user_id}")
+    except Exception as e:
+        traceback.print_exc()
+        retry_in = retry_delay(attempts) if attempts < max_attempts else None
+        db_manager.fail_evaluation(interview_id, f"{type(e).__name__}: {e}", retry_in)
+    finally:
+        # Evaluation cost is added to what the interview itself used
+        db_manager.save_interview_metrics(interview_id, user_id, metrics.pop_interview_totals(user_id))
+        metrics.set_user(None)
+
+def run_worker(db_manager, client, stop, poll_interval, max_attempts, lease_seconds, max_running):
+    while not stop.is_set():
+        try:
+            job = db_manager.claim_evaluation(lease_seconds, max_running, max_attempts)
+        except Exception as e:
+            print(f"Error claiming evaluation: {e}")
+            job = None
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        evaluate(db_manager, client, job, max_attempts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate queued interviews")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('evaluation_concurrency', 2)),
+                        help="evaluations this process runs at once")
+    parser.add_argument("--max-running", type=int, default=int(os.getenv('evaluation_max_running', 0)),
+                        help="cap on evaluations in flight across all workers (0 = no cap)")
+    parser.add_argument("--max-attempts", type=int, default=int(os.getenv('evaluation_max_attempts', 3)))
+    parser.add_argument("--lease-seconds", type=int, default=600,
+                        help="reclaim evaluations left running longer than this")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+
+    client = utils.open_ai_config()
+    db_manager = open_database(maxconn=args.concurrency + 1)
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=run_worker, daemon=True,
+                         args=(db_manager, client, stop, args.poll_interval, args.max_attempts,
+                               args.lease_seconds, args.max_running or None))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    print(f"Evaluation worker started with {args.concurrency} threads")
+    try:
+        while any(thread.is_alive() for thread in threads):
+            stop.wait(1)
+    except KeyboardInterrupt:
+        print("Stopping after in-flight evaluations finish...")
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        db_manager.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Export candidates and their interviews for the ATS.
+
+One row per interview, joined to the candidate's profile, and one row for
+each candidate with no interview in the date range. Rows are streamed from
+the database in fixed-size batches and written as they arrive, so memory
+stays at one batch whatever the table size.
+
+    python export.py candidates.csv --since 2026-01-01 --until 2026-03-31
+    python export.py candidates.parquet --transcripts
+
+CSV goes to stdout when the path is '-'. Parquet needs pyarrow.
+"""
+import argparse
+import csv
+import datetime
+import json
+import sys
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV export still works
+    pa = None
+
+from db_utils import open_database
+
+# Columns holding lists or JSON, written as JSON text
+JSON_COLUMNS = {"tech_stack", "skills", "key_strengths", "areas_for_improvement", "transcript"}
+INT_COLUMNS = {"candidate_id", "user_id", "experience_years", "experience_months", "interview_id",
+               "technical_confidence_score", "communication_score", "conversation_authenticity_score"}
+TIMESTAMP_COLUMNS = {"consent_timestamp", "interviewed_at"}
+
+
+def _cell(column, value):
+    if value is None:
+        return None
+    if column in JSON_COLUMNS:
+        return value if isinstance(value, str) else json.dumps(value)
+    if column in TIMESTAMP_COLUMNS and isinstance(value, str):
+        # SQLite hands back the stored text
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+class CsvSink:
+    def __init__(self, path, columns):
+        self.file = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+class ParquetSink:
+    """Writes each batch as its own row group."""
+
+    def __init__(self, path, columns):
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        self.columns = columns
+        self.schema = pa.schema([(column, self._type(column)) for column in columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    @staticmethod
+    def _type(column):
+        if column in INT_COLUMNS:
+            return pa.int64()
+        if column in TIMESTAMP_COLUMNS:
+            return pa.timestamp("us")
+        return pa.string()
+
+    def write(self, rows):
+        arrays = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(self.schema)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+SINKS = {"csv": CsvSink, "parquet": ParquetSink}
+
+def export(db_manager, path, fmt="csv", since=None, until=None, include_transcripts=False, batch_size=2000):
+    """Stream the export to path; returns the number of rows written."""
+    columns, query, params = db_manager.export_query(since, until, include_transcripts)
+    sink = SINKS[fmt](path, columns)
+    count = 0
+    try:
+        for batch in db_manager.iter_batches(query, params, batch_size):
+            sink.write([[_cell(column, value) for column, value in zip(columns, row)] for row in batch])
+            count += len(batch)
+    finally:
+        sink.close()
+    return count
+
+def _date(text):
+    return datetime.date.fromisoformat(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export candidates and interview evaluations")
+    parser.add_argument("path", help="output file, or - for CSV on stdout")
+    parser.add_argument("--format", choices=sorted(SINKS), help="default: from the file extension, else csv")
+    parser.add_argument("--since", type=_date, help="first interview date to include (YYYY-MM-DD)")
+    parser.add_argument("--until", type=_date, help="last interview date to include (YYYY-MM-DD)")
+    parser.add_argument("--transcripts", action="store_true", help="include the conversation as JSON")
+    parser.add_argument("--batch-size", type=int, default=2000, help="rows fetched per round trip")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.path.endswith(".parquet") else "csv")
+    if fmt == "parquet" and args.path == "-":
+        parser.error("Parquet can't be written to stdout")
+
+    db_manager = open_database(maxconn=1)
+    started = time.perf_counter()
+    try:
+        count = export(db_manager, args.path, fmt, args.since, args.until, args.transcripts, args.batch_size)
+    finally:
+        db_manager.close()
+    print(f"Exported {count} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Answers /v1/chat/completions with canned replies after a configurable
+delay, enforces an optional requests-per-minute limit with real 429
+responses, and supports streaming and forced function calls. Point the app
+at it with:
+
+    python fake_openai.py --port 8900 --latency 0.5 --rpm 60
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake streamlit run hiring.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sample_arguments(schema):
+    """A value that satisfies a (simple) JSON schema."""
+    kind = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {name: sample_arguments(prop) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_arguments(schema.get("items", {"type": "string"}))]
+    if kind == "integer":
+        return random.randint(schema.get("minimum", 0), schema.get("maximum", 10))
+    if kind == "boolean":
+        return False
+    return "This is a placeholder answer from the fake OpenAI server."
+
+class FakeOpenAI:
+    def __init__(self, latency=0.2, jitter=0.1, rpm=None, tokens_per_second=200):
+        self.latency = latency
+        self.jitter = jitter
+        self.rpm = rpm
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self.rate_limited = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Record a request; returns seconds to wait if it is over the RPM limit."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            if not self.rpm:
+                return None
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.rpm:
+                self.rate_limited += 1
+                return 60 - (now - self._recent[0])
+            self._recent.append(now)
+            return None
+
+    def reply(self, body):
+        """(content, function_call) for a request body."""
+        functions = body.get("functions") or []
+        forced = body.get("function_call")
+        if functions and isinstance(forced, dict):
+            function = next((f for f in functions if f["name"] == forced["name"]), functions[0])
+            arguments = sample_arguments(function["parameters"])
+            if "message" in arguments:
+                arguments["message"] = "Can you walk me through how you would design this component?"
+            return None, {"name": function["name"], "arguments": json.dumps(arguments)}
+        return "Thanks. Could you tell me more about a recent project you worked on?", None
+
+    def delay(self):
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            wait = fake.admit()
+            if wait is not None:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                {"retry-after": f"{wait:.1f}", "x-ratelimit-reset-requests": f"{wait:.1f}s"})
+                return
+            fake.delay()
+            content, function_call = fake.reply(body)
+            text = content or function_call["arguments"]
+            prompt_tokens = sum(len(str(msg.get("content", ""))) // 4 for msg in body.get("messages", []))
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                     "total_tokens": prompt_tokens + len(text) // 4}
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            if body.get("stream"):
+                self._stream(body, completion_id, content, function_call, usage)
+                return
+            message = {"role": "assistant", "content": content}
+            if function_call:
+                message["function_call"] = function_call
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "function_call" if function_call else "stop"}],
+                "usage": usage
+            })
+
+        def _stream(self, body, completion_id, content, function_call, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            text = content or function_call["arguments"]
+            pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+            for index, piece in enumerate(pieces):
+                if function_call:
+                    delta = {"function_call": {"arguments": piece}}
+                    if index == 0:
+                        delta["function_call"]["name"] = function_call["name"]
+                        delta["role"] = "assistant"
+                else:
+                    delta = {"content": piece}
+                self._event(completion_id, body, [{"index": 0, "delta": delta, "finish_reason": None}])
+                time.sleep(2 / fake.tokens_per_second)
+            self._event(completion_id, body, [{"index": 0, "delta": {},
+                                               "finish_reason": "function_call" if function_call else "stop"}])
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._event(completion_id, body, [], usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def _event(self, completion_id, body, choices, usage=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model"), "choices": choices}
+            if usage:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+    return Handler
+
+def serve(fake, host="127.0.0.1", port=8900):
+    """Start the fake server on a background thread and return it."""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--rpm", type=int, default=0, help="answer 429 above this many requests per minute")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(args.latency, args.jitter, args.rpm or None)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    server.daemon_threads = True
+    print(f"Fake OpenAI listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{fake.requests} requests, {fake.rate_limited} rate limited")
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,136 @@
 import streamlit as st
 import json
 import os
-from dotenv import load_dotenv
-from datetime import datetime
 import pages, utils  
-from db_utils import DatabaseMan
+import llm_gateway
+import metrics
+import skills
+import time
+import uuid
+from db_utils import open_database
+from conversation_context import ConversationContext
+from transcript import Transcript
+from question_bank import QuestionBank
+from sessions import InterviewSessions
+
+# Lets the interviewer call report whether the interview is over, so no
+# separate end-of-interview completion is needed per turn
+INTERVIEWER_TURN_FUNCTION = {
+    "name": "interviewer_turn",
+    "description": "Send the interviewer's next message to the candidate and report whether the interview is over",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "interview_complete": {
+                "type": "boolean",
+                "description": "True only if all topics are covered, no question is pending and this message closes the interview"
+            },
+            "message": {
+                "type": "string",
+                "description": "The interviewer's next message to the candidate"
+            }
+        },
+        "required": ["interview_complete", "message"]
+    }
+}
+
+SENTIMENT_ANALYSIS_FUNCTION = {
+    "name": "create_sentiment_analysis",
+    "description": "Create a structured sentiment analysis from the interview",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "overall_sentiment": {
+                "type": "string",
+                "enum": ["positive", "neutral", "negative"]
+            },
+            "key_strengths": {
+                "type": "array",
+                "items": {"type": "string"},
+                "maxItems": 3
+            },
+            "areas_for_improvement": {
+                "type": "array",
+                "items": {"type": "string"},
+                "maxItems": 3
+            },
+            "technical_confidence_score": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 10
+            },
+            "conversation_authenticity_score": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 10
+            },
+            "communication_score": {
+                "type": "integer",
+                "minimum": 0,
+                "maximum": 10
+            }
+        },
+        "required": ["overall_sentiment", "key_strengths", "areas_for_improvement",
+                    "technical_confidence_score","conversation_authenticity_score" "communication_score"]
+    }
+}
+
+def sentiment_request(conversation_history):
+    """Chat completion parameters for evaluating a transcript.
+
+    Shared by analyze_sentiment and the batch re-evaluation engine, so both
+    score interviews with the same prompt and schema.
+    """
+    messages = [
+    {"role": "system", "content": "You are an AI that analyzes interview responses to provide structured sentiment analysis."},
+    {"role": "user", "content": (
+        "You will analyze the following interview conversation and provide the sentiment analysis. "
+        "Consider the candidate's responses, tone, and engagement during the interview. "
+        "Evaluate their strengths, areas for improvement, and scores for technical confidence and communication. "
+        "If the responses are minimal or vague, note this explicitly in your analysis. "
+        "Also check if the answers are human generated or AI generated. - if the reply is big and detailed but given in a short time, it may be AI generated."
+        "Here is the conversation: " + f"{conversation_history}"
+    )}
+    ]
+    return {
+        "model": "gpt-4o-mini",
+        "messages": messages,
+        "temperature": 1,
+        "functions": [SENTIMENT_ANALYSIS_FUNCTION],
+        "function_call": {"name": "create_sentiment_analysis"}
+    }
 
 class HiringAssistant:
-    def __init__(self, client):
+    def __init__(self, client, stream=None, end_check=None, priority=utils.INTERACTIVE, use_cache=True):
         self.client = client
-        self.conversation_history = []
+        # The question bank generates openers at background priority, bypassing the cache on refresh
+        self.priority = priority
+        self.use_cache = use_cache
+        # Stream interviewer replies into the chat UI unless disabled in the environment
+        self.stream = stream if stream is not None else os.getenv('stream_responses', 'true').lower() != 'false'
+        # 'inline' reads the end signal from the interviewer call, 'separate' asks a second model
+        self.end_check = end_check or os.getenv('end_check_mode', 'inline')
+        self.interview_complete = False
+        # Shared with the chat UI, which renders it directly
+        self.conversation_history = Transcript()
+        # Bounds the prompt: recent turns verbatim, older ones summarised
+        self.context = ConversationContext(client)
         self.candidate_info = {'experience_years': 0,
                                 'experience_months': 0,
                                 'desired_position': "", 
                                 'tech_stack': []
                                 }
     
-    def get_next_response(self, user_input=None):
-        
-        messages = [
-            {"role": "system", "content": f"""You are an AI technical interviewer conducting a screening interview for a {self.candidate_info['desired_position']} position.
-        The candidate has {self.candidate_info['experience_years']} years and {self.candidate_info['experience_months']} months of experience and expertise in: {', '.join(self.candidate_info['tech_stack'])}.
-        First you need to check if the expertise mentioned are relevant to the position, it may be some random words.
-        If not a relevant skill, inform the candidate the same and move to next relevant skill
+    def _build_messages(self, user_input=None):
+        """System prompt plus the conversation so far, recording the new user input."""
+        # Entries outside the taxonomy were kept as typed by the candidate, so they are marked unverified
+        known, unverified = skills.get_index().normalize(self.candidate_info['tech_stack'])[:2]
+        tech_stack = ', '.join(known + [f"{entry} (unverified)" for entry in unverified])
+        system_message = {"role": "system", "content": f"""You are an AI technical interviewer conducting a screening interview for a {self.candidate_info['desired_position']} position.
+        The candidate has {self.candidate_info['experience_years']} years and {self.candidate_info['experience_months']} months of experience and expertise in: {tech_stack or 'the core technologies of the position'}.
+        First check that each listed skill is relevant to the position; if one is not, tell the candidate so and move on to the next relevant skill.
 
-        And if it is relevant skill:
+        Your task:
         1. Ask relevant technical questions about each technology in their stack
         2. Ask follow-up questions based on their responses, limiting follow-ups to 1-3 questions per topic.
         3. Transition to the next topic once follow-ups are exhausted or answers are complete or the user has no proper answer to the question.
@@ -41,25 +147,130 @@ class HiringAssistant:
         - Mark topics as covered when sufficiently discussed
         
         Start by introducing yourself and asking the first technical question."""
-        }]
-        
-        # Add conversation history
-        for msg in self.conversation_history:
-            messages.append(msg)
+        }
+        if self.end_check == 'inline':
+            system_message["content"] += """
+
+        Always reply through the interviewer_turn function. Set interview_complete to true only when
+        your message ends the interview and neither you nor the candidate has anything pending."""
             
         # Add user's latest input if provided
         if user_input:
-            messages.append({"role": "user", "content": user_input})
-            self.conversation_history.append({"role": "user", "content": user_input})
-        
-    
-        response = utils.generate_openai_response(self.client, messages, model='gpt-4o-mini')
-        assistant_response = response.content
-        self.conversation_history.append({"role": "assistant", "content": assistant_response})
+            self.conversation_history.add("user", user_input)
+
+        # Recent turns verbatim, earlier ones as a running summary within the token budget
+        return self.context.build(system_message, self.conversation_history)
+
+    def _read_turn(self, arguments):
+        """Pull the message and end-of-interview flag out of an interviewer_turn call."""
+        try:
+            turn = json.loads(arguments)
+        except json.JSONDecodeError:
+            # Keep whatever text arrived and let the interview carry on
+            self.interview_complete = False
+            if not arguments.lstrip().startswith("{"):
+                return arguments  # The model answered in plain text
+            return utils.partial_json_string(arguments, "message")
+        self.interview_complete = bool(turn.get("interview_complete"))
+        return turn.get("message", "")
+
+    def _forget_unanswered(self, user_input):
+        # The call failed, so drop the input it was answering; the candidate can resend it
+        if user_input and self.conversation_history and self.conversation_history[-1]["role"] == "user":
+            self.conversation_history.pop()
+
+    def get_opening_response(self, question_bank=None):
+        """The first interviewer message, served from the question bank when it has one.
+
+        On a miss the reply generated for this candidate is banked for the next one.
+        """
+        opener = question_bank.opener(self.candidate_info) if question_bank else None
+        if opener is None:
+            opener = self.get_next_response()
+            if question_bank and not self.interview_complete:
+                question_bank.store(self.candidate_info, opener)
+            return opener
+        self.interview_complete = False
+        self.conversation_history.add("assistant", opener)
+        return opener
+
+    def get_next_response(self, user_input=None):
+        try:
+            return self._next_response(user_input)
+        except utils.LLMError:
+            self._forget_unanswered(user_input)
+            raise
+
+    def _next_response(self, user_input):
+        messages = self._build_messages(user_input)
+        if self.end_check == 'inline':
+            response = utils.generate_openai_response(self.client, messages, model='gpt-4o-mini',
+                                                      functions=[INTERVIEWER_TURN_FUNCTION],
+                                                      function_call={"name": "interviewer_turn"},
+                                                      priority=self.priority, use_cache=self.use_cache,
+                                                      call_site='interviewer_turn')
+            if response.function_call:
+                assistant_response = self._read_turn(response.function_call.arguments)
+            else:
+                self.interview_complete = False
+                assistant_response = response.content
+        else:
+            response = utils.generate_openai_response(self.client, messages, model='gpt-4o-mini',
+                                                      priority=self.priority, use_cache=self.use_cache,
+                                                      call_site='interviewer_turn')
+            assistant_response = response.content
+        self.conversation_history.add("assistant", assistant_response)
         
         return assistant_response
+
+    def stream_next_response(self, user_input=None):
+        """Same as get_next_response, but yields the reply as it is generated.
+
+        The finished reply is appended to conversation_history once the
+        stream is exhausted.
+        """
+        try:
+            yield from self._stream_response(user_input)
+        except utils.LLMError:
+            self._forget_unanswered(user_input)
+            raise
+
+    def _stream_response(self, user_input):
+        messages = self._build_messages(user_input)
+        if self.end_check == 'inline':
+            # The reply arrives as interviewer_turn JSON; surface the message text as it grows
+            arguments = ""
+            shown = ""
+            for delta in utils.stream_openai_response(self.client, messages, model='gpt-4o-mini',
+                                                      functions=[INTERVIEWER_TURN_FUNCTION],
+                                                      function_call={"name": "interviewer_turn"},
+                                                      priority=self.priority, use_cache=self.use_cache,
+                                                      call_site='interviewer_turn'):
+                arguments += delta
+                text = utils.partial_json_string(arguments, "message")
+                if len(text) > len(shown):
+                    yield text[len(shown):]
+                    shown = text
+            assistant_response = self._read_turn(arguments)
+            if len(assistant_response) > len(shown) and assistant_response.startswith(shown):
+                yield assistant_response[len(shown):]
+        else:
+            chunks = []
+            for delta in utils.stream_openai_response(self.client, messages, model='gpt-4o-mini',
+                                                      priority=self.priority, use_cache=self.use_cache,
+                                                      call_site='interviewer_turn'):
+                chunks.append(delta)
+                yield delta
+            assistant_response = "".join(chunks)
+        self.conversation_history.add("assistant", assistant_response)
              
     def should_end_interview(self):
+        if self.end_check == 'inline':
+            return self.interview_complete
+        return self.check_end_with_llm()
+
+    def check_end_with_llm(self):
+        """Fallback end check: ask a separate model about the latest exchange."""
         if len(self.conversation_history) < 2:
             return False  # Not enough data to evaluate
         assistant_message = self.conversation_history[-2]["content"]
@@ -81,77 +292,53 @@ class HiringAssistant:
         based on the above should the interview be ended?
         Provide the answer as 'yes' or 'no'
         """}]
-        response = utils.generate_openai_response(self.client, messages)
+        response = utils.generate_openai_response(self.client, messages, call_site='end_check')
         return response.content.strip().lower() == "yes"
   
     def analyze_sentiment(self):
         """Analyze the sentiment of interview responses"""
-        
-        messages = [
-        {"role": "system", "content": "You are an AI that analyzes interview responses to provide structured sentiment analysis."},
-        {"role": "user", "content": (
-            "You will analyze the following interview conversation and provide the sentiment analysis. "
-            "Consider the candidate's responses, tone, and engagement during the interview. "
-            "Evaluate their strengths, areas for improvement, and scores for technical confidence and communication. "
-            "If the responses are minimal or vague, note this explicitly in your analysis. "
-            "Also check if the answers are human generated or AI generated. - if the reply is big and detailed but given in a short time, it may be AI generated."
-            "Here is the conversation: " + f"{self.conversation_history}"
-        )}
-        ]
-
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            functions=[{
-                "name": "create_sentiment_analysis",
-                "description": "Create a structured sentiment analysis from the interview",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "overall_sentiment": {
-                            "type": "string",
-                            "enum": ["positive", "neutral", "negative"]
-                        },
-                        "key_strengths": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "maxItems": 3
-                        },
-                        "areas_for_improvement": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "maxItems": 3
-                        },
-                        "technical_confidence_score": {
-                            "type": "integer",
-                            "minimum": 0,
-                            "maximum": 10
-                        },
-                        "conversation_authenticity_score": {
-                            "type": "integer",
-                            "minimum": 0,
-                            "maximum": 10
-                        },
-                        "communication_score": {
-                            "type": "integer",
-                            "minimum": 0,
-                            "maximum": 10
-                        }
-                    },
-                    "required": ["overall_sentiment", "key_strengths", "areas_for_improvement",
-                                "technical_confidence_score","conversation_authenticity_score" "communication_score"]
-                }
-            }],
-            function_call={"name": "create_sentiment_analysis"}
+        request = sentiment_request(self.conversation_history)
+
+        # Goes through the response cache, so re-running an evaluation on an
+        # unchanged transcript does not pay for the completion again
+        response = utils.generate_openai_response(
+            self.client,
+            request["messages"],
+            model=request["model"],
+            temperature=request["temperature"],
+            functions=request["functions"],
+            function_call=request["function_call"],
+            # Evaluations can wait; live interview turns go first
+            priority=llm_gateway.BACKGROUND,
+            call_site='analyze_sentiment'
         )
-        response_data = json.loads(response.choices[0].message.function_call.arguments)
-        return response_data
+        return json.loads(response.function_call.arguments)
  
 
-try:
-    db_manager = DatabaseMan()
-except Exception as e:
-    st.error("Error connecting to the database. Please refresh.")
+@st.cache_resource
+def get_db_manager():
+    # One pooled DatabaseMan per process, shared by every session
+    return open_database()
+
+@st.cache_resource
+def get_question_bank(_db_manager, _client):
+    # Shared by every session so each opener is generated once per process at most
+    if os.getenv('question_bank', 'on').lower() == 'off':
+        return None
+    return QuestionBank(_db_manager, _client)
+
+@st.cache_resource
+def get_interview_sessions(_db_manager, _client):
+    # Live interviews of every session in this process; idle ones are hibernated to the database
+    return InterviewSessions(_db_manager, lambda: HiringAssistant(_client))
+
+@st.cache_resource
+def start_metrics_server():
+    # Prometheus scrape endpoint, started once per process when metrics_port is set;
+    # metrics_host defaults to localhost, use 0.0.0.0 to let a remote Prometheus scrape it
+    port = os.getenv('metrics_port')
+    return metrics.start_http_server(int(port), os.getenv('metrics_host', '127.0.0.1')) if port else None
+
 
 def main():
 
@@ -162,29 +349,48 @@ def main():
     )
     
     client = utils.open_ai_config()
+    try:
+        db_manager = get_db_manager()
+    except Exception:
+        st.error("Error connecting to the database. Please refresh.")
+        return
+    
+    start_metrics_server()
+    sessions = get_interview_sessions(db_manager, client)
     
     # Initialize session states
     if 'page' not in st.session_state:
         st.session_state.page = 'login'
-    if 'assistant' not in st.session_state:
-        st.session_state.assistant = HiringAssistant(client)
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
+    if 'session_key' not in st.session_state:
+        # The interview itself lives in the process-wide session registry under this key
+        st.session_state.session_key = uuid.uuid4().hex
+
+    # LLM and DB time spent during this rerun is tallied for the signed-in user
+    user = st.session_state.get('user')
+    metrics.set_user(user['user_id'] if user else None)
+    page = st.session_state.page
+    started = time.perf_counter()
     
-    if st.session_state.page == 'login':
-        pages.login_page(db_manager)
-    elif st.session_state.page == 'welcome':
-        pages.render_welcome(db_manager)
-    elif st.session_state.page == 'collect_info':
-        pages.render_collect_info(db_manager)
-    elif st.session_state.page == 'interview':
-        pages.render_interview(client, db_manager)
-    elif st.session_state.page == 'completion':
-        pages.render_completion()  
-    elif st.session_state.page == 'admin_dashboard':
-        pages.admin_dashboard(db_manager)
-    elif st.session_state.page == 'interview_eval':
-        pages.interview_evaluation(db_manager)
+    try:
+        if st.session_state.page == 'login':
+            pages.login_page(db_manager)
+        elif st.session_state.page == 'welcome':
+            pages.render_welcome(db_manager)
+        elif st.session_state.page == 'collect_info':
+            pages.render_collect_info(db_manager, sessions, get_question_bank(db_manager, client))
+        elif st.session_state.page == 'interview':
+            pages.render_interview(client, db_manager, sessions)
+        elif st.session_state.page == 'completion':
+            pages.render_completion()  
+        elif st.session_state.page == 'admin_dashboard':
+            pages.admin_dashboard(db_manager)
+        elif st.session_state.page == 'interview_eval':
+            pages.interview_evaluation(db_manager)
+        elif st.session_state.page == 'analytics':
+            pages.score_analytics(db_manager)
+    finally:
+        # st.rerun() ends a render by raising, so time it either way
+        metrics.record_render(page, time.perf_counter() - started)
         
 if __name__ == "__main__":    
     main()
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""Content-addressed cache for chat completions.
+
+Responses are keyed by a hash of everything that determines them (model,
+messages, temperature, functions), so an identical request is answered
+without calling the API again. Lookups go through an in-memory LRU and,
+when enabled, an on-disk SQLite tier.
+
+Cached requests and responses contain interview transcripts, which are
+candidates' personal data, so the SQLite tier is opt-in (llm_cache=sqlite).
+Point llm_cache_path at a location only the app's user can read, on an
+encrypted volume where required, and size llm_cache_ttl to the retention
+period for transcripts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(model, messages, temperature, functions=None, function_call=None):
+    payload = json.dumps({
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "functions": functions,
+        "function_call": function_call
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class MemoryCache:
+    """Thread-safe LRU holding up to max_entries responses."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCache:
+    """On-disk tier with a time-to-live and a cap on the number of entries."""
+
+    def __init__(self, path='.llm_cache.sqlite', ttl=7 * 24 * 3600, max_entries=50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            # Owner-only; SQLite creates the -wal and -shm files with the same permissions
+            os.chmod(path, 0o600)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._writes += 1
+            # Evicting on every write would mean a COUNT(*) per insert
+            if self._writes % 100 == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?
+                )
+            """, (excess,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+class LLMCache:
+    """Looks a key up in each tier in turn, promoting hits to the faster tiers."""
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self.hits = {type(tier).__name__: 0 for tier in tiers}
+        self.misses = 0
+
+    def get(self, key):
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    faster.set(key, value)
+                with self._lock:
+                    self.hits[type(tier).__name__] += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.hits.values()) + self.misses
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": (total - self.misses) / total if total else 0.0
+            }
+
+def cache_from_env():
+    """Build the cache described by the llm_cache* settings, or None when disabled.
+
+    llm_cache is 'off', 'memory' (the default) or 'sqlite' (memory in front of
+    a file at llm_cache_path, which then holds transcripts; see the module docstring).
+    """
+    mode = os.getenv('llm_cache', 'memory').lower()
+    if mode == 'off':
+        return None
+    tiers = [MemoryCache(int(os.getenv('llm_cache_memory_entries', 1000)))]
+    if mode == 'sqlite':
+        tiers.append(SQLiteCache(
+            os.getenv('llm_cache_path', '.llm_cache.sqlite'),
+            ttl=float(os.getenv('llm_cache_ttl', 7 * 24 * 3600)),
+            max_entries=int(os.getenv('llm_cache_max_entries', 50000))
+        ))
+    return LLMCache(tiers)
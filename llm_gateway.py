@@ -0,0 +1,150 @@
+"""In-process admission control for OpenAI calls.
+
+Every session shares one gateway, which tracks requests and tokens against
+the account's RPM/TPM quota with token buckets. Live interview turns are
+served before background work such as evaluations, and callers that would
+wait longer than their priority allows are turned away with a wait
+estimate instead of piling up and triggering 429s.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class GatewayOverloaded(Exception):
+    """The request would wait longer than allowed; wait_estimate is in seconds."""
+
+    def __init__(self, wait_estimate):
+        super().__init__(f"LLM quota exhausted, estimated wait {wait_estimate:.0f}s")
+        self.wait_estimate = wait_estimate
+
+class TokenBucket:
+    """Refills at rate_per_minute up to capacity. Not thread-safe; the gateway locks it."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount tokens are available."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= amount
+
+    def adjust(self, amount):
+        # Correct an earlier estimate; may go negative, which delays the next caller
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class Reservation:
+    __slots__ = ("estimated_tokens", "priority", "waited")
+
+    def __init__(self, estimated_tokens, priority, waited):
+        self.estimated_tokens = estimated_tokens
+        self.priority = priority
+        self.waited = waited
+
+class LLMGateway:
+    def __init__(self, rpm, tpm, max_wait=None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_wait = max_wait or {INTERACTIVE: 15, BACKGROUND: 300}
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, seq, estimated_tokens)
+        self._seq = itertools.count()
+        self._blocked_until = 0.0
+        self.admitted = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.shed = {INTERACTIVE: 0, BACKGROUND: 0}
+
+    def _wait_for(self, request_count, token_count, now):
+        return max(self._blocked_until - now,
+                   self.requests.wait_time(request_count, now),
+                   self.tokens.wait_time(token_count, now))
+
+    def _estimate_wait(self, entry, now):
+        """Time until entry could run, assuming everything ahead of it runs first."""
+        ahead = [queued for queued in self._queue if queued < entry]
+        return self._wait_for(len(ahead) + 1, sum(queued[2] for queued in ahead) + entry[2], now)
+
+    def acquire(self, estimated_tokens, priority=INTERACTIVE):
+        """Block until the call may go ahead, or raise GatewayOverloaded."""
+        started = time.monotonic()
+        deadline = started + self.max_wait[priority]
+        with self._cond:
+            entry = (priority, next(self._seq), estimated_tokens)
+            heapq.heappush(self._queue, entry)
+            try:
+                estimate = self._estimate_wait(entry, started)
+                if started + estimate > deadline:
+                    raise GatewayOverloaded(estimate)
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] is entry:
+                        wait = self._wait_for(1, estimated_tokens, now)
+                        if wait <= 0:
+                            self.requests.take(1, now)
+                            self.tokens.take(estimated_tokens, now)
+                            self.admitted[priority] += 1
+                            return Reservation(estimated_tokens, priority, now - started)
+                    else:
+                        wait = self._estimate_wait(entry, now)
+                    if now + wait > deadline:
+                        raise GatewayOverloaded(wait)
+                    self._cond.wait(timeout=max(0.01, min(wait or 0.05, deadline - now)))
+            except GatewayOverloaded:
+                self.shed[priority] += 1
+                raise
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def settle(self, reservation, actual_tokens):
+        """Replace the reservation's token estimate with the usage the API reported."""
+        with self._cond:
+            self.tokens.adjust(reservation.estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def penalize(self, seconds):
+        """Hold every caller back after the API answered 429."""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "queued": len(self._queue),
+                "admitted": dict(self.admitted),
+                "shed": dict(self.shed),
+                "request_tokens": round(self.requests.tokens, 1),
+                "llm_tokens": round(self.tokens.tokens, 1),
+                "blocked_for": max(0.0, self._blocked_until - now)
+            }
+
+def gateway_from_env():
+    """Build the gateway from openai_rpm/openai_tpm, or None when llm_gateway=off."""
+    if os.getenv('llm_gateway', 'on').lower() == 'off':
+        return None
+    return LLMGateway(
+        rpm=float(os.getenv('openai_rpm', 500)),
+        tpm=float(os.getenv('openai_tpm', 200000)),
+        max_wait={
+            INTERACTIVE: float(os.getenv('llm_max_wait_interactive', 15)),
+            BACKGROUND: float(os.getenv('llm_max_wait_background', 300))
+        }
+    )
@@ -0,0 +1,201 @@
+"""Timing and token accounting for the hot paths.
+
+LLM calls, DatabaseMan methods, password pool calls and page renders are
+recorded into in-process counters and histograms, exposed in the Prometheus
+text format by start_http_server. LLM and database measurements are also
+summed per user so each interview's totals can be stored next to it in the
+database.
+
+Prometheus series are labelled by call site or method only; per-user
+breakdowns would explode label cardinality and live in interview_metrics
+instead.
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# The user whose request the current thread is serving; set once per Streamlit rerun
+current_user_id = contextvars.ContextVar('current_user_id', default=None)
+
+def set_user(user_id):
+    current_user_id.set(user_id)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+class Registry:
+    def __init__(self, max_interviews=10000):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._interviews = OrderedDict()  # user_id -> totals, oldest first
+        self.max_interviews = max_interviews
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, labels)] += amount
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram()
+            histogram.observe(value)
+
+    def add_to_interview(self, user_id, **amounts):
+        if user_id is None:
+            return
+        with self._lock:
+            totals = self._interviews.pop(user_id, None) or defaultdict(float)
+            for key, amount in amounts.items():
+                totals[key] += amount
+            self._interviews[user_id] = totals
+            # Abandoned interviews are never popped; forget the oldest
+            while len(self._interviews) > self.max_interviews:
+                self._interviews.popitem(last=False)
+
+    def pop_interview_totals(self, user_id):
+        with self._lock:
+            return dict(self._interviews.pop(user_id, {}))
+
+    def render(self):
+        """All series in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            lines, typed = [], set()
+            for (name, labels), value in counters:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_labels(labels)} {value:g}")
+            for (name, labels), histogram in histograms:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:g}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+registry = Registry()
+
+def record_llm(call_site, seconds, prompt_tokens=0, completion_tokens=0, cache="off", error=None):
+    labels = (("call_site", call_site),)
+    registry.observe("llm_request_seconds", labels, seconds)
+    registry.inc("llm_requests_total", labels + (("cache", cache), ("error", error or "")))
+    registry.inc("llm_tokens_total", labels + (("kind", "prompt"),), prompt_tokens)
+    registry.inc("llm_tokens_total", labels + (("kind", "completion"),), completion_tokens)
+    registry.add_to_interview(current_user_id.get(), llm_calls=1, llm_seconds=seconds,
+                              prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              cache_hits=1 if cache == "hit" else 0)
+
+def record_db(method, seconds, user_id=None, error=None):
+    labels = (("method", method),)
+    registry.observe("db_query_seconds", labels, seconds)
+    if error:
+        registry.inc("db_errors_total", labels + (("error", error),))
+    registry.add_to_interview(user_id if user_id is not None else current_user_id.get(),
+                              db_calls=1, db_seconds=seconds)
+
+def record_password(operation, seconds=None, error=None):
+    """A password pool call; seconds is None for requests turned away before they were queued."""
+    labels = (("operation", operation),)
+    if seconds is not None:
+        registry.observe("password_seconds", labels, seconds)
+    registry.inc("password_operations_total", labels + (("error", error or ""),))
+
+def record_render(page, seconds):
+    registry.observe("page_render_seconds", (("page", page),), seconds)
+
+def pop_interview_totals(user_id):
+    """Totals gathered for user_id since the last pop, ready for save_interview_metrics."""
+    return registry.pop_interview_totals(user_id)
+
+def instrument_methods(cls, skip=()):
+    """Class decorator timing every public method of cls with record_db.
+
+    Generator methods are left alone, since calling them only creates the
+    generator. The user_id argument, when a method has one, tags the call.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or name in skip or not inspect.isfunction(method):
+            continue
+        if inspect.isgeneratorfunction(method):
+            continue
+        setattr(cls, name, _timed_method(name, method))
+    return cls
+
+def _timed_method(name, method):
+    signature = inspect.signature(method)
+    takes_user_id = 'user_id' in signature.parameters
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        user_id = None
+        if takes_user_id:
+            try:
+                user_id = signature.bind(*args, **kwargs).arguments.get('user_id')
+            except TypeError:
+                pass
+        started = time.perf_counter()
+        error = None
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            record_db(name, time.perf_counter() - started, user_id, error)
+    return wrapper
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve GET /metrics on a daemon thread.
+
+    Local-only by default, since the series name internal call sites and
+    database methods; bind another host only behind a trusted network.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,327 @@
+"""Versioned schema migrations for the Postgres database.
+
+Each migration is (version, description, steps). A step is either a SQL
+statement or a callable taking a cursor, for data migrations that are
+easier to express in Python. Applied versions are recorded in
+schema_migrations, so startup runs a single version check once the schema
+is current. New migrations are appended with the next version number;
+applied ones are never edited.
+"""
+
+import ast
+import json
+
+from psycopg2.extras import Json, execute_batch
+
+import skills
+
+
+def parse_legacy_list(value):
+    """Best-effort parse of a list stored as text by older versions.
+
+    Values were written either as Python list reprs or as Postgres array
+    literals, depending on how the column had been created.
+    """
+    if value is None or isinstance(value, list):
+        return value
+    text = value.strip()
+    if not text:
+        return []
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            parsed = parse(text)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(parsed, (list, tuple)):
+            return [str(item) for item in parsed]
+    if text.startswith('{') and text.endswith('}'):
+        return _parse_array_literal(text[1:-1])
+    return [text]
+
+def _parse_array_literal(body):
+    items, current, quoted, escaped, was_quoted = [], [], False, False, False
+    for ch in body:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+            was_quoted = True
+        elif ch == ',' and not quoted:
+            items.append(''.join(current) if was_quoted else ''.join(current).strip())
+            current, was_quoted = [], False
+        else:
+            current.append(ch)
+    if current or was_quoted:
+        items.append(''.join(current) if was_quoted else ''.join(current).strip())
+    return items
+
+def evaluation_lists_to_jsonb(cursor):
+    """Convert key_strengths/areas_for_improvement from text to JSONB arrays."""
+    for column in ("key_strengths", "areas_for_improvement"):
+        cursor.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'interviews' AND column_name = %s
+        """, (column,))
+        if cursor.fetchone()[0] == 'jsonb':
+            continue
+        cursor.execute(f"ALTER TABLE interviews ADD COLUMN {column}_jsonb JSONB")
+        cursor.execute(f"SELECT id, {column} FROM interviews WHERE {column} IS NOT NULL")
+        rows = [(Json(parse_legacy_list(value)), row_id) for row_id, value in cursor.fetchall()]
+        execute_batch(cursor, f"UPDATE interviews SET {column}_jsonb = %s WHERE id = %s", rows, page_size=500)
+        cursor.execute(f"ALTER TABLE interviews DROP COLUMN {column}")
+        cursor.execute(f"ALTER TABLE interviews RENAME COLUMN {column}_jsonb TO {column}")
+
+def _integer_score(column):
+    # Older databases may hold scores as text; keep only clean integers
+    return f"""
+        ALTER TABLE interviews ALTER COLUMN {column} TYPE INT
+        USING CASE WHEN {column}::text ~ '^\\s*[0-9]+\\s*$' THEN trim({column}::text)::int END;
+    """
+
+def backfill_candidate_skills(cursor):
+    """Fill candidates.skills from tech stacks saved before it existed."""
+    index = skills.get_index()
+    cursor.execute("SELECT id, tech_stack FROM candidates WHERE tech_stack IS NOT NULL")
+    rows = [(index.known(tech_stack), candidate_id) for candidate_id, tech_stack in cursor.fetchall()]
+    cursor.executemany("UPDATE candidates SET skills = %s WHERE id = %s", rows)
+
+def backfill_candidate_scores(cursor):
+    """Seed candidate_scores with each candidate's latest evaluated interview."""
+    cursor.execute("""
+        INSERT INTO candidate_scores (user_id, interview_id, technical_confidence_score,
+                                      communication_score, conversation_authenticity_score,
+                                      overall_sentiment, evaluated_at)
+        SELECT user_id, id, technical_confidence_score, communication_score,
+               conversation_authenticity_score, overall_sentiment, CURRENT_TIMESTAMP
+        FROM interviews
+        WHERE id IN (SELECT MAX(id) FROM interviews WHERE evaluation_status = 'done' GROUP BY user_id)
+        ON CONFLICT (user_id) DO NOTHING
+    """)
+
+MIGRATIONS = [
+    (1, "Base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            role VARCHAR(20) NOT NULL
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS candidates (
+            id SERIAL PRIMARY KEY,
+            user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            full_name VARCHAR(100) NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            phone VARCHAR(15),
+            education VARCHAR(50),
+            experience_years INT DEFAULT 0,
+            experience_months INT DEFAULT 0,
+            desired_position VARCHAR(50),
+            location VARCHAR(100),
+            tech_stack TEXT[],
+            consent_timestamp TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS interviews (
+            id SERIAL PRIMARY KEY,
+            user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            conversation_history JSONB,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    ]),
+    (2, "Evaluation columns written by save_conversation_to_db", [
+        """
+        ALTER TABLE interviews
+            ADD COLUMN IF NOT EXISTS overall_sentiment VARCHAR(20),
+            ADD COLUMN IF NOT EXISTS key_strengths TEXT,
+            ADD COLUMN IF NOT EXISTS areas_for_improvement TEXT,
+            ADD COLUMN IF NOT EXISTS technical_confidence_score INT,
+            ADD COLUMN IF NOT EXISTS conversation_authenticity_score INT,
+            ADD COLUMN IF NOT EXISTS communication_score INT;
+        """
+    ]),
+    (3, "Evaluation queue state", [
+        # Rows from before the queue were evaluated inline, so they default to 'done'
+        """
+        ALTER TABLE interviews
+            ADD COLUMN IF NOT EXISTS evaluation_status VARCHAR(20) NOT NULL DEFAULT 'done',
+            ADD COLUMN IF NOT EXISTS evaluation_attempts INT NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS evaluation_error TEXT,
+            ADD COLUMN IF NOT EXISTS evaluation_available_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS evaluation_started_at TIMESTAMP;
+        """
+    ]),
+    (4, "Indexes for per-user lookups and the admin table", [
+        # get_candidate_info, update_candidate_info, delete_candidate_info
+        "CREATE INDEX IF NOT EXISTS candidates_user_id_idx ON candidates (user_id);",
+        # get_interviews, fetch_interview_evaluation
+        "CREATE INDEX IF NOT EXISTS interviews_user_id_idx ON interviews (user_id, id);",
+        # fetch_user_table, fetch_user_page
+        "CREATE INDEX IF NOT EXISTS users_role_idx ON users (role);",
+        "CREATE INDEX IF NOT EXISTS candidates_full_name_idx ON candidates (full_name, user_id);",
+        """
+        CREATE INDEX IF NOT EXISTS candidates_desired_position_idx
+            ON candidates ((COALESCE(desired_position, '')), user_id);
+        """,
+        # claim_evaluation only ever looks at queued rows
+        """
+        CREATE INDEX IF NOT EXISTS interviews_evaluation_queue_idx
+            ON interviews (id) WHERE evaluation_status IN ('pending', 'running');
+        """
+    ]),
+    (5, "Typed evaluation storage: JSONB lists and integer scores", [
+        evaluation_lists_to_jsonb,
+        _integer_score("technical_confidence_score"),
+        _integer_score("conversation_authenticity_score"),
+        _integer_score("communication_score"),
+    ]),
+    (6, "Per-interview LLM and database usage", [
+        """
+        CREATE TABLE IF NOT EXISTS interview_metrics (
+            interview_id INT PRIMARY KEY REFERENCES interviews(id) ON DELETE CASCADE,
+            user_id INT REFERENCES users(id) ON DELETE CASCADE,
+            llm_calls INT NOT NULL DEFAULT 0,
+            llm_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            prompt_tokens INT NOT NULL DEFAULT 0,
+            completion_tokens INT NOT NULL DEFAULT 0,
+            cache_hits INT NOT NULL DEFAULT 0,
+            db_calls INT NOT NULL DEFAULT 0,
+            db_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    ]),
+    (7, "Per-turn transcript log for in-progress interviews", [
+        """
+        CREATE TABLE IF NOT EXISTS interview_turns (
+            interview_id INT NOT NULL REFERENCES interviews(id) ON DELETE CASCADE,
+            seq INT NOT NULL,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (interview_id, seq)
+        );
+        """,
+        # get_open_interview and start_interview
+        """
+        CREATE INDEX IF NOT EXISTS interviews_in_progress_idx
+            ON interviews (user_id, id) WHERE evaluation_status = 'in_progress';
+        """
+    ]),
+    (8, "Normalized candidate skills for the admin skill filter", [
+        "ALTER TABLE candidates ADD COLUMN IF NOT EXISTS skills TEXT[] NOT NULL DEFAULT '{}';",
+        backfill_candidate_skills,
+        "CREATE INDEX IF NOT EXISTS candidates_skills_idx ON candidates USING GIN (skills);"
+    ]),
+    (9, "Pre-generated interview openers", [
+        # generated_at is epoch seconds, compared against time.time() by question_bank.py
+        """
+        CREATE TABLE IF NOT EXISTS question_bank (
+            position_key TEXT NOT NULL,
+            skill TEXT NOT NULL,
+            experience_bucket VARCHAR(20) NOT NULL,
+            position_label TEXT,
+            opener TEXT NOT NULL,
+            generated_at DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (position_key, skill, experience_bucket)
+        );
+        """
+    ]),
+    (10, "Full-text search over interview transcripts", [
+        "ALTER TABLE interviews ADD COLUMN IF NOT EXISTS search_vector tsvector;",
+        # Candidate answers weigh more (A) than the interviewer's questions (B)
+        """
+        CREATE OR REPLACE FUNCTION interviews_search_vector() RETURNS trigger AS $$
+        BEGIN
+            IF jsonb_typeof(NEW.conversation_history) IS DISTINCT FROM 'array' THEN
+                NEW.search_vector := NULL;
+                RETURN NEW;
+            END IF;
+            NEW.search_vector :=
+                setweight(to_tsvector('english', COALESCE((
+                    SELECT string_agg(turn->>'content', ' ')
+                    FROM jsonb_array_elements(NEW.conversation_history) turn
+                    WHERE turn->>'role' = 'user'), '')), 'A') ||
+                setweight(to_tsvector('english', COALESCE((
+                    SELECT string_agg(turn->>'content', ' ')
+                    FROM jsonb_array_elements(NEW.conversation_history) turn
+                    WHERE turn->>'role' = 'assistant'), '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        """,
+        "DROP TRIGGER IF EXISTS interviews_search_vector_update ON interviews;",
+        """
+        CREATE TRIGGER interviews_search_vector_update
+            BEFORE INSERT OR UPDATE OF conversation_history ON interviews
+            FOR EACH ROW EXECUTE FUNCTION interviews_search_vector();
+        """,
+        # Fires the trigger for interviews saved before it existed
+        "UPDATE interviews SET conversation_history = conversation_history WHERE conversation_history IS NOT NULL;",
+        "CREATE INDEX IF NOT EXISTS interviews_search_idx ON interviews USING GIN (search_vector);"
+    ]),
+    (11, "Per-candidate score summary for analytics", [
+        # One row per candidate, refreshed by DatabaseMan whenever an evaluation is stored
+        """
+        CREATE TABLE IF NOT EXISTS candidate_scores (
+            user_id INT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            interview_id INT NOT NULL REFERENCES interviews(id) ON DELETE CASCADE,
+            technical_confidence_score INT,
+            communication_score INT,
+            conversation_authenticity_score INT,
+            overall_sentiment VARCHAR(20),
+            evaluated_at TIMESTAMP
+        );
+        """,
+        backfill_candidate_scores
+    ]),
+    (12, "Interviewer notes of hibernated interview sessions", [
+        "ALTER TABLE interviews ADD COLUMN IF NOT EXISTS context_notes JSONB;"
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(cursor):
+    cursor.execute("SELECT to_regclass('schema_migrations')")
+    if cursor.fetchone()[0] is None:
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cursor.fetchone()[0]
+
+def migrate(db_manager):
+    """Bring the schema up to LATEST_VERSION, one transaction per migration."""
+    with db_manager.cursor() as cursor:
+        if current_version(cursor) >= LATEST_VERSION:
+            return
+
+    for version, description, steps in MIGRATIONS:
+        with db_manager.cursor() as cursor:
+            # Several app processes may start at once; only one applies each migration
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            if current_version(cursor) >= version:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            print(f"Applied migration {version}: {description}")
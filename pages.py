@@ -1,36 +1,149 @@
 import streamlit as st
 import utils
+import metrics
+import skills
+import analytics
 from datetime import datetime
 import pandas as pd
+import os
+from passwords import PasswordPoolBusy
 
 
+CANDIDATE_SORT_OPTIONS = {"Name": "full_name", "Desired Designation": "desired_position", "Newest": "user_id"}
+CANDIDATE_PAGE_SIZE = 25
+SEARCH_PAGE_SIZE = 20
+
+def open_evaluation(user_id, name):
+    st.session_state.selected_user_id = int(user_id)
+    st.session_state.selected_user_name = name
+    st.session_state.page = 'interview_eval'
+    st.rerun()
+
+def transcript_search(db_manager, query):
+    """Ranked transcript matches for the admin search box, one page at a time."""
+    if st.session_state.get('search_query') != query:
+        st.session_state.search_query = query
+        st.session_state.search_cursors = [None]
+    cursors = st.session_state.search_cursors
+
+    rows, next_cursor = db_manager.search_interviews(query, after=cursors[-1], limit=SEARCH_PAGE_SIZE)
+    if not rows:
+        st.warning("No interviews mention that.")
+        return
+
+    for interview_id, user_id, full_name, desired_position, rank, snippet in rows:
+        col1, col2 = st.columns([8, 2])
+        col1.markdown(f"**{full_name or f'User {user_id}'}** · {desired_position or 'No designation'}  \n{snippet}")
+        if col2.button("Evaluation", key=f"search_hit_{interview_id}"):
+            open_evaluation(user_id, full_name or f"User {user_id}")
+
+    col1, col2, col3 = st.columns([2, 6, 2])
+    if col1.button("Previous", disabled=len(cursors) == 1, key="search_previous"):
+        cursors.pop()
+        st.rerun()
+    col2.markdown(f"Page {len(cursors)}")
+    if col3.button("Next", disabled=next_cursor is None, key="search_next"):
+        cursors.append(next_cursor)
+        st.rerun()
+
+def score_analytics(db_manager):
+    st.title("Score Analytics")
+    if st.button("Back to Candidates"):
+        st.session_state.page = 'admin_dashboard'
+        st.rerun()
+
+    position_filter = st.text_input("Filter by designation", key="analytics_position")
+    df = analytics.score_frame(db_manager.fetch_candidate_scores(position_filter.strip() or None))
+    if df.empty:
+        st.warning("No evaluated candidates yet.")
+        return
+
+    st.subheader("Scores by Position")
+    st.dataframe(analytics.position_summary(df), use_container_width=True)
+
+    positions = sorted(df["Position"].unique())
+    position = st.selectbox("Position", positions)
+    in_position = df[df["Position"] == position]
+
+    st.subheader("Score Distribution")
+    cols = st.columns(len(analytics.SCORE_COLUMNS))
+    for col, score in zip(cols, analytics.SCORE_COLUMNS.values()):
+        col.caption(score)
+        col.bar_chart(analytics.score_distribution(in_position, score))
+
+    st.subheader("Shortlist")
+    cols = st.columns(len(analytics.DEFAULT_WEIGHTS) + 1)
+    weights = {score: col.slider(f"{score} weight", 0.0, 1.0, default, 0.05)
+               for col, (score, default) in zip(cols, analytics.DEFAULT_WEIGHTS.items())}
+    per_position = cols[-1].number_input("Top", min_value=1, max_value=100, value=10)
+    ranked = analytics.shortlist(analytics.rank_candidates(in_position, weights), per_position)
+    st.dataframe(ranked[["Rank", "Name", "Desired Designation", *analytics.SCORE_COLUMNS.values(),
+                         "Composite", "Percentile", "Sentiment"]],
+                 hide_index=True, use_container_width=True)
+
 def admin_dashboard(db_manager):
+    st.title("Candidates Table")
+    if st.button("Score Analytics"):
+        st.session_state.page = 'analytics'
+        st.rerun()
+
+    search_query = st.text_input("Search interview transcripts", placeholder='e.g. kafka partitioning, "event sourcing"')
+    if search_query.strip():
+        transcript_search(db_manager, search_query.strip())
+        return
+
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
+    name_filter = col1.text_input("Search by name")
+    position_filter = col2.text_input("Filter by designation")
+    sort_label = col3.selectbox("Sort by", list(CANDIDATE_SORT_OPTIONS))
+    descending = col4.toggle("Descending", value=(sort_label == "Newest"))
+    skill_filter = st.multiselect("Has all of these skills", skills.get_index().canonical_names())
+
+    # Start from the first page whenever the filters or ordering change
+    filters = (name_filter, position_filter, tuple(skill_filter), sort_label, descending)
+    if st.session_state.get('candidate_filters') != filters:
+        st.session_state.candidate_filters = filters
+        st.session_state.candidate_cursors = [None]  # keyset cursor of every page visited
+    cursors = st.session_state.candidate_cursors
 
-    data = db_manager.fetch_user_table()
+    data, next_cursor = db_manager.fetch_user_page(
+        name=name_filter.strip() or None,
+        position=position_filter.strip() or None,
+        skills=skill_filter or None,
+        sort_by=CANDIDATE_SORT_OPTIONS[sort_label],
+        descending=descending,
+        after=cursors[-1],
+        limit=CANDIDATE_PAGE_SIZE
+    )
     if not data:
         st.warning("No candidates found.")
         return
     
     # Convert to DataFrame for Streamlit table
-    df = pd.DataFrame(data, columns=["Name", "Desired Designation", "User ID"])
+    df = pd.DataFrame(data, columns=["Name", "Desired Designation", "User ID", "Sentiment",
+                                     "Technical", "Communication", "Authenticity", "Evaluation"])
 
-    # Display table
-    st.title("Candidates Table")
+    st.caption("Select a row to see the candidate's evaluation.")
+    event = st.dataframe(
+        df,
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"candidates_page_{len(cursors)}"
+    )
+    if event.selection.rows:
+        row = df.iloc[event.selection.rows[0]]
+        open_evaluation(row["User ID"], row["Name"])
 
-    col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
-    col1.markdown("**Name**")
-    col2.markdown("**Desired Designation**")
-    col4.markdown("**More Details**")
-
-    for index, row in df.iterrows():
-        col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
-        col1.write(row["Name"])
-        col2.write(row["Desired Designation"])
-        if col4.button(f"Select", key=f"select_{row['User ID']}"):
-            st.session_state.selected_user_id = row["User ID"]
-            st.session_state.selected_user_name = row["Name"]
-            st.session_state.page = 'interview_eval'
-            st.rerun()
+    col1, col2, col3 = st.columns([2, 6, 2])
+    if col1.button("Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    col2.markdown(f"Page {len(cursors)}")
+    if col3.button("Next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
           
 def interview_evaluation(db_manager):
     user_id = st.session_state.selected_user_id
@@ -40,8 +153,21 @@ def interview_evaluation(db_manager):
 
     if not evaluation_data:
         st.warning("No interview evaluations found.")
+    elif evaluation_data["Evaluation Status"] != "done":
+        st.title(f"Interview Evaluation Results of {name}")
+        if evaluation_data["Evaluation Status"] == "failed":
+            st.error(f"Evaluation failed: {evaluation_data['Evaluation Error']}")
+        elif evaluation_data["Evaluation Status"] in ("in_progress", "abandoned"):
+            st.info(f"Interview {evaluation_data['Evaluation Status'].replace('_', ' ')}; there is no transcript yet.")
+            return
+        else:
+            st.info(f"Evaluation {evaluation_data['Evaluation Status']}. Check back shortly.")
+        if st.button("read_interview"):
+            st.session_state.page = 'interview'
+            st.rerun()
     else:
         st.title(f"Interview Evaluation Results of {name}")
+        st.caption("Evaluation done")
 
         # Display each field in a structured way
         st.subheader("Evaluation Overview")
@@ -78,7 +204,11 @@ def login_page(db_manager):
         username = st.text_input("Username", key="login_username")
         password = st.text_input("Password", type="password", key="login_password")
         if st.button("Login"):
-            is_authenticated, role, user_id = db_manager.login_user(username, password)
+            try:
+                is_authenticated, role, user_id = db_manager.login_user(username, password)
+            except PasswordPoolBusy as e:
+                st.warning(str(e))
+                return
             if is_authenticated:
                 st.session_state['user'] = {'username': username, 'role': role, 'user_id': user_id}
                 if role == 'Admin':
@@ -115,6 +245,8 @@ def login_page(db_manager):
                         st.rerun()
                     else: 
                         st.error("Username already taken. Please choose a different username.")
+                except PasswordPoolBusy as e:
+                    st.warning(str(e))
                 except Exception as e:
                     st.error(f"Error registering user: {e}")
 
@@ -144,10 +276,12 @@ def render_welcome(db_manager):
     
     if consent:
         if st.button("Start Interview"):
+            # Profiles from candidate_import are saved before the candidate has agreed
+            db_manager.record_consent(st.session_state['user']['user_id'])
             st.session_state.page = 'collect_info'
             st.rerun()
 
-def render_collect_info(db_manager):
+def render_collect_info(db_manager, sessions, question_bank=None):
     # Fetch existing user data
     user_id = st.session_state['user']['user_id']
     user_data = db_manager.get_candidate_info(user_id)
@@ -172,13 +306,18 @@ def render_collect_info(db_manager):
         location = st.text_input("Current Location*", value=user_data['location'])
         tech_stack = st.text_input("Tech Stack (comma-separated list)*", 
                                     value=", ".join(user_data['tech_stack']))
+        # Already confirmed when the saved stack holds entries outside the taxonomy
+        keep_unrecognized = st.checkbox(skills.KEEP_UNRECOGNIZED_LABEL,
+                                        value=bool(skills.get_index().normalize(user_data['tech_stack'])[1]),
+                                        help="They are saved and discussed in the interview as you typed them")
 
         modify_button = st.button("Modify")
         delete_button = st.button("Delete")
         go_to_interview = st.button("Go to Interview")
         
         if modify_button:
-            is_valid, error_message = utils.validate_inputs(full_name, email, phone, desired_position, location, tech_stack)
+            is_valid, error_message = utils.validate_inputs(full_name, email, phone, desired_position, location,
+                                                            tech_stack, keep_unrecognized)
             if is_valid:
                 updated_info = {
                     "full_name": full_name,
@@ -189,22 +328,28 @@ def render_collect_info(db_manager):
                     "experience_months": experience_months,
                     "desired_position": desired_position,
                     "location": location,
-                    "tech_stack": [tech.strip() for tech in tech_stack.split(',')],
+                    "tech_stack": skills.stack_to_save(tech_stack),
+                    "consent_timestamp": user_data['consent_timestamp'],
                 }
                 db_manager.update_candidate_info(user_id, updated_info)
                 st.success("Your information has been updated!")
-                st.session_state.assistant.candidate_info = {
-                    "experience_years": updated_info["experience_years"],
-                    "experience_months": updated_info["experience_months"],
-                    "desired_position": updated_info["desired_position"],
-                    "tech_stack": updated_info['tech_stack']
-                }
                 if st.session_state.interview_history:
                     st.session_state.page = 'interview'    
                     st.rerun()    
                 else:
-                    initial_response = st.session_state.assistant.get_next_response()
-                    st.session_state.messages = [{"role": "assistant", "content": initial_response}]
+                    assistant = sessions.new_assistant()
+                    assistant.candidate_info = {
+                        "experience_years": updated_info["experience_years"],
+                        "experience_months": updated_info["experience_months"],
+                        "desired_position": updated_info["desired_position"],
+                        "tech_stack": updated_info['tech_stack']
+                    }
+                    try:
+                        assistant.get_opening_response(question_bank)
+                    except utils.LLMError:
+                        st.error("Could not start the interview right now. Please try again.")
+                        return
+                    begin_interview(db_manager, sessions, user_id, assistant)
                     st.session_state.page = 'interview'    
                     st.rerun()
             else:
@@ -236,12 +381,15 @@ def render_collect_info(db_manager):
             location = st.text_input("Current Location*")
             tech_stack = st.text_input("Tech Stack (comma-separated list)*", 
                                         help="Example: Python, React, MongoDB")
+            keep_unrecognized = st.checkbox(skills.KEEP_UNRECOGNIZED_LABEL,
+                                            help="They are saved and discussed in the interview as you typed them")
             
             submit_button = st.form_submit_button("Submit")
             
             if submit_button:
                 # Validate required fields
-                is_valid, error_message = utils.validate_inputs(full_name, email, phone, desired_position, location, tech_stack)
+                is_valid, error_message = utils.validate_inputs(full_name, email, phone, desired_position, location,
+                                                                tech_stack, keep_unrecognized)
                 if is_valid:
                     candidate_info = {
                     "full_name": full_name,
@@ -252,27 +400,58 @@ def render_collect_info(db_manager):
                     "experience_months": experience_months,
                     "desired_position": desired_position,
                     "location": location,
-                    "tech_stack": [tech.strip() for tech in tech_stack.split(',')],
+                    "tech_stack": skills.stack_to_save(tech_stack),
                     "consent_timestamp" : datetime.now().isoformat()
                     }
                     user_id = st.session_state['user']['user_id']
                     db_manager.save_candidate(user_id, candidate_data=candidate_info)
-                    st.session_state.assistant.candidate_info = {
+                    assistant = sessions.new_assistant()
+                    assistant.candidate_info = {
                         "experience_years": experience_years,
                         "experience_months": experience_months,
                         "desired_position": desired_position,
-                        "tech_stack": [tech.strip() for tech in tech_stack.split(',')]
+                        "tech_stack": skills.stack_to_save(tech_stack)
                     }
-                    initial_response = st.session_state.assistant.get_next_response()
-                    st.session_state.messages = [{"role": "assistant", "content": initial_response}]
+                    try:
+                        assistant.get_opening_response(question_bank)
+                    except utils.LLMError:
+                        st.error("Your details are saved, but the interview could not start. Please try again.")
+                        return
+                    begin_interview(db_manager, sessions, user_id, assistant)
                     st.session_state.page = 'interview'
                     st.rerun()
                 else:
                     st.error(error_message)
 
-def render_interview(client, db_manager):
+def begin_interview(db_manager, sessions, user_id, assistant):
+    """Start logging the interview turn by turn and keep its assistant live for this session."""
+    interview_id = db_manager.start_interview(user_id)
+    sessions.start(st.session_state.session_key, assistant, interview_id)
+    st.session_state.interview_ending = False
+    record_turns(db_manager, interview_id, assistant.conversation_history, len(assistant.conversation_history))
+
+def record_turns(db_manager, interview_id, transcript, count):
+    """Queue the last count turns of the transcript for saving."""
+    if interview_id is None:
+        return
+    for seq in range(len(transcript) - count, len(transcript)):
+        turn = transcript[seq]
+        db_manager.append_turn(interview_id, seq, turn.role, turn.content)
+
+def finish_interview(db_manager, sessions, user_id, assistant, interview_id, sentiment_data=None):
+    """Close the logged interview, or save the whole transcript if it was never logged."""
+    sessions.end(st.session_state.session_key)
+    transcript = assistant.conversation_history.to_dicts()
+    if interview_id is not None:
+        # The in-memory transcript stands in for any turns the writer failed to store
+        interview_id = db_manager.complete_interview(interview_id, sentiment_data, transcript)
+    if interview_id is None:
+        interview_id = db_manager.save_conversation_to_db(user_id, transcript, sentiment_data)
+    return interview_id
+
+def render_interview(client, db_manager, sessions):
     
-    interview_history = st.session_state.interview_history
+    interview_history = st.session_state.get('interview_history')
     
     if interview_history:
         st.subheader("Interview Details")
@@ -294,11 +473,22 @@ def render_interview(client, db_manager):
         st.title("Technical Screening Interview")
         if 'interview_ending' not in st.session_state:
             st.session_state.interview_ending = False
+
+        # Live in this process, or rebuilt from the database after a refresh, restart or hibernation
+        user_id = st.session_state['user']['user_id']
+        assistant, interview_id = sessions.get(st.session_state.session_key, user_id)
+        if assistant is None:
+            st.info("You have no interview in progress.")
+            if st.button("Back to Your Details"):
+                st.session_state.page = 'collect_info'
+                st.rerun()
+            return
+        transcript = assistant.conversation_history
         
         # Display chat history
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.write(message["content"])
+        for turn in transcript:
+            with st.chat_message(turn.role):
+                st.write(turn.content)
         
         # Only show chat input and handle messages if not in ending state
         if not st.session_state.interview_ending:
@@ -306,17 +496,30 @@ def render_interview(client, db_manager):
                 with st.chat_message("user"):
                     st.write(user_input)
                 
-                assistant_response = st.session_state.assistant.get_next_response(user_input)
-                
                 with st.chat_message("assistant"):
-                    st.write(assistant_response)
+                    try:
+                        if assistant.stream:
+                            # Render deltas as they arrive; write_stream returns the full reply
+                            assistant_response = st.write_stream(assistant.stream_next_response(user_input))
+                        else:
+                            assistant_response = assistant.get_next_response(user_input)
+                            st.write(assistant_response)
+                    except utils.LLMOverloadedError as e:
+                        st.warning(f"We're handling a lot of interviews right now. Please send your answer again in about {max(1, round(e.wait_estimate))} seconds.")
+                        return
+                    except utils.LLMError:
+                        st.error("The interviewer is unavailable right now. Please send your answer again.")
+                        return
                 
-                st.session_state.messages.extend([
-                    {"role": "user", "content": user_input},
-                    {"role": "assistant", "content": assistant_response}
-                ])
+                # The assistant has added the answer and its reply to the transcript
+                record_turns(db_manager, interview_id, transcript, 2)
                 
-                if st.session_state.assistant.should_end_interview():
+                try:
+                    ending = assistant.should_end_interview()
+                except utils.LLMError:
+                    # The reply is already shown and saved; check again after the next answer
+                    ending = False
+                if ending:
                     st.session_state.interview_ending = True
                     st.rerun()
                 
@@ -326,9 +529,20 @@ def render_interview(client, db_manager):
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Yes, End Interview", key="end_button"):
-                    st.write("Analysing and Saving interview...")
-                    sentiment_data = st.session_state.assistant.analyze_sentiment()
-                    db_manager.save_conversation_to_db(st.session_state['user']['user_id'], st.session_state.messages, sentiment_data)
+                    if os.getenv('evaluation_mode', 'queue') == 'inline':
+                        st.write("Analysing and Saving interview...")
+                        try:
+                            sentiment_data = assistant.analyze_sentiment()
+                        except utils.LLMError:
+                            # Keep the transcript; the evaluation worker can score it later
+                            sentiment_data = None
+                        interview_id = finish_interview(db_manager, sessions, user_id, assistant, interview_id,
+                                                        sentiment_data)
+                    else:
+                        # Close the interview now; evaluation_worker.py scores it in the background
+                        st.write("Saving interview...")
+                        interview_id = finish_interview(db_manager, sessions, user_id, assistant, interview_id)
+                    db_manager.save_interview_metrics(interview_id, user_id, metrics.pop_interview_totals(user_id))
                     st.session_state.page = "completion"
                     st.rerun()
             with col2:
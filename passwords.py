@@ -0,0 +1,146 @@
+"""Password hashing and verification on a bounded process pool.
+
+bcrypt is deliberately slow and CPU-bound. Running it in worker processes
+keeps the Streamlit script threads free during signup bursts, and a cap on
+queued requests turns overload into a fast "busy, retry" answer instead of
+an ever-growing wait.
+"""
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+import metrics
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password operations are already queued."""
+
+def hash_password(password, rounds=12):
+    """Hash the password using bcrypt."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def verify_password(password, hashed):
+    """Verify the provided password against the stored hash."""
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+class PasswordHasher:
+    def __init__(self, workers=None, max_pending=None, rounds=None, timeout=30):
+        self.workers = int(workers or os.getenv('bcrypt_workers', max(1, (os.cpu_count() or 2) // 2)))
+        self.max_pending = int(max_pending or os.getenv('bcrypt_max_pending', self.workers * 8))
+        self.rounds = int(rounds or os.getenv('bcrypt_rounds', 12))
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._latencies = {"hash": deque(maxlen=1000), "verify": deque(maxlen=1000)}
+        self._counts = {"hash": 0, "verify": 0, "rejected": 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn rather than fork: the app process is multi-threaded
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _reset_executor(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _call(self, call):
+        """call(executor), retried once on a fresh pool if a worker died."""
+        executor = self._get_executor()
+        try:
+            return call(executor)
+        except BrokenProcessPool:
+            # A worker was killed (e.g. out of memory); the pool never recovers on its own
+            self._reset_executor(executor)
+            return call(self._get_executor())
+
+    def _run(self, operation, fn, *args):
+        if not self._pending.acquire(blocking=False):
+            with self._lock:
+                self._counts["rejected"] += 1
+            metrics.record_password(operation, error="busy")
+            raise PasswordPoolBusy("Too many sign-in requests right now. Please retry in a few seconds.")
+        started = time.perf_counter()
+        error = None
+        try:
+            return self._call(lambda executor: executor.submit(fn, *args).result(timeout=self.timeout))
+        except FutureTimeoutError:
+            error = "timeout"
+            raise PasswordPoolBusy("Sign-in is taking too long right now. Please retry in a few seconds.") from None
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._pending.release()
+            # Latency includes time spent waiting for a free worker
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._counts[operation] += 1
+                self._latencies[operation].append(seconds)
+            metrics.record_password(operation, seconds, error)
+
+    def hash(self, password):
+        return self._run("hash", hash_password, password, self.rounds)
+
+    def hash_many(self, passwords, chunksize=8):
+        """Hash a batch of passwords across every worker, in order.
+
+        Meant for bulk jobs such as candidate_import: it waits for the whole
+        batch and is not limited by max_pending.
+        """
+        started = time.perf_counter()
+        hashed = self._call(lambda executor: list(executor.map(hash_password, passwords,
+                                                               itertools.repeat(self.rounds),
+                                                               chunksize=chunksize)))
+        metrics.record_password("hash_many", time.perf_counter() - started)
+        with self._lock:
+            self._counts["hash"] += len(hashed)
+            if hashed:
+                self._latencies["hash"].append((time.perf_counter() - started) / len(hashed))
+        return hashed
+
+    def verify(self, password, hashed):
+        return self._run("verify", verify_password, password, hashed)
+
+    def metrics(self):
+        """Counts and latency percentiles (seconds) over the last 1000 calls of each kind."""
+        with self._lock:
+            result = {"rejected": self._counts["rejected"], "rounds": self.rounds}
+            for operation, samples in self._latencies.items():
+                ordered = sorted(samples)
+                result[operation] = {
+                    "count": self._counts[operation],
+                    "p50": ordered[len(ordered) // 2] if ordered else None,
+                    "p95": ordered[int(len(ordered) * 0.95)] if ordered else None,
+                    "max": ordered[-1] if ordered else None
+                }
+            return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+def get_hasher():
+    """Process-wide PasswordHasher shared by every session."""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher()
+        return _hasher
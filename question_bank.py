@@ -0,0 +1,201 @@
+"""Pre-generated opening messages for new interviews.
+
+The first interviewer message (introduction plus first technical
+question) depends little on the individual candidate, so it is generated
+once per (position, skill, experience bucket) and stored in the
+question_bank table. A candidate whose combination is banked starts the
+interview without waiting on the LLM. On a miss the candidate's live
+opener is banked for the next candidate; stale entries are regenerated on
+a background thread.
+
+    python question_bank.py warm --limit 200
+"""
+import argparse
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+import llm_gateway
+import skills
+
+logger = logging.getLogger(__name__)
+# Upper bound in years (exclusive) of each bucket; the last has none
+EXPERIENCE_BUCKETS = ((2, "junior"), (5, "mid"), (None, "senior"))
+# Experience the generated opener is written for
+BUCKET_YEARS = {"junior": 1, "mid": 3, "senior": 7}
+
+
+def experience_bucket(years, months=0):
+    total = (years or 0) + (months or 0) / 12
+    for limit, bucket in EXPERIENCE_BUCKETS:
+        if limit is None or total < limit:
+            return bucket
+
+def position_key(position):
+    """Lowercase words only, so 'Backend  Engineer' and 'backend engineer.' share openers."""
+    return " ".join(re.findall(r"[a-z0-9+#]+", (position or "").lower()))
+
+def bank_key(candidate_info):
+    """(position_key, skill, experience_bucket) for a candidate, or None if it can't be banked.
+
+    The opener asks about the first recognised skill in the stack.
+    """
+    position = position_key(candidate_info.get('desired_position'))
+    known = skills.get_index().known(candidate_info.get('tech_stack'))
+    if not position or not known:
+        return None
+    return position, known[0], experience_bucket(candidate_info.get('experience_years'),
+                                                 candidate_info.get('experience_months'))
+
+class QuestionBank:
+    def __init__(self, db_manager, client, max_age=None, reload_interval=60):
+        self.db_manager = db_manager
+        self.client = client
+        # Entries older than this are still served but regenerated in the background
+        self.max_age = float(max_age or os.getenv('question_bank_max_age', 7 * 24 * 3600))
+        # Picks up openers generated by other processes
+        self.reload_interval = reload_interval
+        self._entries = {}  # key -> (opener, generated_at)
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._thread = None
+
+    def _reload(self):
+        if time.monotonic() - self._loaded_at < self.reload_interval:
+            return
+        self._loaded_at = time.monotonic()
+        try:
+            rows = self.db_manager.load_question_bank()
+        except Exception:
+            logger.warning("Could not load the question bank", exc_info=True)
+            return
+        with self._lock:
+            self._entries = {(row[0], row[1], row[2]): (row[3], row[4]) for row in rows}
+
+    def opener(self, candidate_info):
+        """A banked opening message for the candidate, or None on a miss."""
+        key = bank_key(candidate_info)
+        if key is None:
+            return None
+        self._reload()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None  # The live opener is banked through store()
+        if time.time() - entry[1] > self.max_age:
+            self.request(key, candidate_info.get('desired_position'))
+        return entry[0]
+
+    def has(self, key):
+        """Whether an opener is banked for key, fresh or not."""
+        self._reload()
+        with self._lock:
+            return key in self._entries
+
+    def store(self, candidate_info, opener):
+        """Bank an opener generated live for a candidate whose combination missed."""
+        key = bank_key(candidate_info)
+        if key is None or not opener:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] <= self.max_age:
+                return
+        try:
+            self._save(key, candidate_info.get('desired_position'), opener)
+        except Exception:
+            logger.warning("Could not bank opener for %s", key, exc_info=True)
+
+    def request(self, key, position_label):
+        """Queue key for background generation unless it is already queued."""
+        with self._lock:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="question-bank", daemon=True)
+                self._thread.start()
+        self._queue.put((key, position_label))
+
+    def _run(self):
+        while True:
+            key, position_label = self._queue.get()
+            try:
+                self.generate(key, position_label)
+            except Exception:
+                logger.warning("Could not generate an opener for %s", key, exc_info=True)
+            finally:
+                with self._lock:
+                    self._queued.discard(key)
+
+    def generate(self, key, position_label):
+        """Ask the interviewer for an opener for key and store it."""
+        from hiring import HiringAssistant
+
+        position, skill, bucket = key
+        assistant = HiringAssistant(self.client, stream=False, priority=llm_gateway.BACKGROUND, use_cache=False)
+        assistant.candidate_info = {
+            "experience_years": BUCKET_YEARS[bucket],
+            "experience_months": 0,
+            "desired_position": position_label or position,
+            "tech_stack": [skill]
+        }
+        opener = assistant.get_next_response()
+        if not opener or assistant.interview_complete:
+            return None
+        self._save(key, position_label, opener)
+        return opener
+
+    def _save(self, key, position_label, opener):
+        position, skill, bucket = key
+        generated_at = time.time()
+        self.db_manager.save_question(position, skill, bucket, position_label or position, opener, generated_at)
+        with self._lock:
+            self._entries[key] = (opener, generated_at)
+
+def warm(db_manager, client, limit):
+    """Generate openers for the combinations of the most recent candidates that aren't banked yet."""
+    bank = QuestionBank(db_manager, client)
+    with db_manager.cursor() as cursor:
+        cursor.execute("""
+            SELECT desired_position, tech_stack, experience_years, experience_months
+            FROM candidates ORDER BY id DESC LIMIT %s
+            """, (limit,))
+        rows = cursor.fetchall()
+    keys = {}
+    for position, tech_stack, years, months in rows:
+        key = bank_key({"desired_position": position, "tech_stack": tech_stack,
+                        "experience_years": years, "experience_months": months})
+        if key is not None and not bank.has(key):
+            keys.setdefault(key, position)
+    for key, position_label in keys.items():
+        try:
+            bank.generate(key, position_label)
+            print(f"Banked opener for {key}")
+        except Exception:
+            logger.warning("Could not generate an opener for %s", key, exc_info=True)
+    print(f"{len(keys)} combinations generated")
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the opening-question bank")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warm_parser = subparsers.add_parser("warm", help="pre-generate openers for recent candidates")
+    warm_parser.add_argument("--limit", type=int, default=500, help="recent candidates to look at")
+    args = parser.parse_args()
+
+    import utils
+    from db_utils import open_database
+
+    db_manager = open_database(maxconn=2)
+    try:
+        warm(db_manager, utils.open_ai_config(), args.limit)
+    finally:
+        db_manager.close()
+
+if __name__ == "__main__":
+    main()
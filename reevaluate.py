@@ -0,0 +1,226 @@
+"""Re-score stored interviews in bulk, e.g. after the evaluation prompt changes.
+
+Interviews are streamed from Postgres with a server-side cursor and
+evaluated by a pool of worker threads. All calls go through the shared LLM
+gateway, so the run stays inside the account's rate limits. Results are
+written back in batches, and a checkpoint file lets an interrupted run
+resume where it stopped. The checkpoint is deleted when a run completes.
+
+    python reevaluate.py run --workers 8 --checkpoint reeval.json
+    python reevaluate.py emit-batch requests.jsonl
+    python reevaluate.py ingest-batch results.jsonl
+
+emit-batch/ingest-batch produce and consume OpenAI Batch API JSONL files
+for offline processing.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import utils
+from db_utils import open_database
+from hiring import HiringAssistant, sentiment_request
+
+
+def run_fingerprint(statuses):
+    """Identifies the evaluation prompt, model and schema plus the statuses being re-scored."""
+    request = sentiment_request("")
+    return hashlib.sha256(json.dumps([request, sorted(statuses)], sort_keys=True).encode()).hexdigest()[:16]
+
+class Checkpoint:
+    """Progress of a run, saved as JSON after every flushed batch.
+
+    Only a run with the same fingerprint resumes from it, so a re-score after
+    the prompt changes starts from the first interview again. It is deleted
+    once a run gets through every interview.
+    """
+
+    def __init__(self, path, fingerprint=None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.last_id = 0
+        self.processed = 0
+        self.failed_ids = []
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("fingerprint") != fingerprint:
+                print(f"Ignoring {path}: it was written for a different prompt or statuses")
+                return
+            self.last_id = state["last_id"]
+            self.processed = state["processed"]
+            self.failed_ids = state["failed_ids"]
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "last_id": self.last_id,
+                       "processed": self.processed, "failed_ids": self.failed_ids}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+class Reevaluator:
+    def __init__(self, db_manager, client, workers, batch_size, checkpoint):
+        self.db_manager = db_manager
+        self.client = client
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        # True once a run has streamed every matching interview
+        self.finished = False
+        self._results = []
+
+    def evaluate(self, row):
+        interview_id, _, conversation_history = row
+        assistant = HiringAssistant(self.client)
+        assistant.conversation_history = conversation_history
+        return interview_id, assistant.analyze_sentiment()
+
+    def run(self, statuses, limit=None):
+        rows = self.db_manager.iter_interviews(self.checkpoint.last_id, statuses, self.batch_size)
+        in_flight = {}  # future -> interview id
+        last_streamed = self.checkpoint.last_id
+        submitted = 0
+        self.finished = True
+        with ThreadPoolExecutor(self.workers) as pool:
+            for row in rows:
+                # Keep a couple of rows per worker queued; the cursor supplies the rest lazily
+                while len(in_flight) >= self.workers * 2:
+                    self._collect(in_flight, last_streamed)
+                in_flight[pool.submit(self.evaluate, row)] = row[0]
+                last_streamed = row[0]
+                submitted += 1
+                if limit and submitted >= limit:
+                    rows.close()
+                    self.finished = False
+                    break
+            while in_flight:
+                self._collect(in_flight, last_streamed)
+        self._flush(last_streamed)
+        return submitted
+
+    def _collect(self, in_flight, last_streamed):
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            interview_id = in_flight.pop(future)
+            try:
+                self._results.append(future.result())
+            except Exception as e:
+                print(f"Interview {interview_id} failed: {type(e).__name__}: {e}", file=sys.stderr)
+                self.checkpoint.failed_ids.append(interview_id)
+        if len(self._results) >= self.batch_size:
+            # Everything below the oldest evaluation still running is finished
+            safe_id = min(in_flight.values()) - 1 if in_flight else last_streamed
+            self._flush(safe_id)
+
+    def _flush(self, safe_id):
+        self.db_manager.save_evaluations(self._results)
+        self.checkpoint.processed += len(self._results)
+        self.checkpoint.last_id = max(self.checkpoint.last_id, safe_id)
+        self.checkpoint.save()
+        print(f"Saved {len(self._results)} evaluations, checkpoint at interview {self.checkpoint.last_id}")
+        self._results = []
+
+def emit_batch(db_manager, path, statuses, after_id):
+    """Write one Batch API request per interview to path."""
+    count = 0
+    with open(path, "w") as f:
+        for interview_id, _, conversation_history in db_manager.iter_interviews(after_id, statuses):
+            f.write(json.dumps({
+                "custom_id": f"interview-{interview_id}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": sentiment_request(conversation_history)
+            }) + "\n")
+            count += 1
+    print(f"Wrote {count} requests to {path}")
+
+def ingest_batch(db_manager, path, batch_size):
+    """Store the evaluations from a Batch API output file."""
+    results, failed, saved = [], 0, 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            interview_id = int(record["custom_id"].rsplit("-", 1)[1])
+            response = record.get("response") or {}
+            try:
+                if record.get("error") or response.get("status_code") != 200:
+                    raise ValueError(record.get("error") or f"status {response.get('status_code')}")
+                message = response["body"]["choices"][0]["message"]
+                results.append((interview_id, json.loads(message["function_call"]["arguments"])))
+            except (KeyError, ValueError, TypeError) as e:
+                print(f"Interview {interview_id} failed: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            if len(results) >= batch_size:
+                db_manager.save_evaluations(results)
+                saved += len(results)
+                results = []
+    db_manager.save_evaluations(results)
+    saved += len(results)
+    print(f"Saved {saved} evaluations, {failed} failed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-evaluate stored interviews")
+    parser.add_argument("--statuses", default="done,failed",
+                        help="comma-separated evaluation statuses to include")
+    parser.add_argument("--batch-size", type=int, default=100, help="rows per write-back")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="evaluate with the live API")
+    run_parser.add_argument("--workers", type=int, default=4)
+    run_parser.add_argument("--rpm", type=float, help="request budget for this run (default: openai_rpm)")
+    run_parser.add_argument("--checkpoint", default="reevaluate_checkpoint.json")
+    run_parser.add_argument("--limit", type=int, help="stop after this many interviews")
+    run_parser.add_argument("--no-cache", action="store_true",
+                            help="ignore cached completions for unchanged transcripts")
+
+    emit_parser = subparsers.add_parser("emit-batch", help="write a Batch API input file")
+    emit_parser.add_argument("path")
+    emit_parser.add_argument("--after-id", type=int, default=0)
+
+    ingest_parser = subparsers.add_parser("ingest-batch", help="store a Batch API output file")
+    ingest_parser.add_argument("path")
+    args = parser.parse_args()
+
+    # The gateway and cache read their settings on first use, so these still apply
+    if args.command == "run":
+        if args.rpm:
+            os.environ['openai_rpm'] = str(args.rpm)
+        if args.no_cache:
+            os.environ['llm_cache'] = 'off'
+        # A batch job would rather queue than be shed
+        os.environ.setdefault('llm_max_wait_background', '3600')
+
+    statuses = [status.strip() for status in args.statuses.split(",") if status.strip()]
+    db_manager = open_database(maxconn=4)
+    try:
+        if args.command == "run":
+            checkpoint = Checkpoint(args.checkpoint, run_fingerprint(statuses))
+            reevaluator = Reevaluator(db_manager, utils.open_ai_config(), args.workers, args.batch_size, checkpoint)
+            count = reevaluator.run(statuses, args.limit)
+            print(f"Done: {count} interviews this run, {len(checkpoint.failed_ids)} failed in total")
+            if reevaluator.finished:
+                if checkpoint.failed_ids:
+                    print(f"Failed interview ids: {', '.join(map(str, checkpoint.failed_ids))}")
+                # The next run re-scores everything instead of resuming past the last id
+                checkpoint.clear()
+        elif args.command == "emit-batch":
+            emit_batch(db_manager, args.path, statuses, args.after_id)
+        else:
+            ingest_batch(db_manager, args.path, args.batch_size)
+    finally:
+        db_manager.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Live interview state for active sessions only.
+
+A Streamlit session lasts as long as its browser tab. Rather than each
+session holding its HiringAssistant for that long, the session keeps a
+key in st.session_state and the assistant lives here, in one registry per
+process. Sessions idle for longer than idle_timeout, or the least recently
+used beyond max_live, are hibernated: the turns are already in
+interview_turns, so only the interviewer's running notes are written to
+the interview row before the assistant is dropped. The next interaction
+rebuilds it from the database, so memory grows with active interviews
+rather than open tabs. Interviews that could not be logged have nothing
+to be rebuilt from and stay live until they end.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+class InterviewSessions:
+    def __init__(self, db_manager, new_assistant, idle_timeout=None, max_live=None):
+        self.db_manager = db_manager
+        # Returns a fresh HiringAssistant
+        self.new_assistant = new_assistant
+        self.idle_timeout = float(idle_timeout or os.getenv('session_idle_timeout', 600))
+        self.max_live = int(max_live or os.getenv('session_max_live', 500))
+        self._live = OrderedDict()  # key -> [assistant, interview_id, last_used], least recently used first
+        self._lock = threading.Lock()
+
+    def start(self, key, assistant, interview_id):
+        """Register the assistant of an interview that has just begun."""
+        with self._lock:
+            self._live.pop(key, None)
+            self._live[key] = [assistant, interview_id, time.monotonic()]
+        self.hibernate_idle()
+
+    def get(self, key, user_id):
+        """(assistant, interview_id) of the session's interview, rebuilt if it was hibernated.
+
+        interview_id is None for an interview that could not be logged, and
+        (None, None) is returned when the user has no interview open.
+        """
+        with self._lock:
+            entry = self._live.get(key)
+            if entry is not None:
+                entry[2] = time.monotonic()
+                self._live.move_to_end(key)
+        self.hibernate_idle()
+        if entry is not None:
+            return entry[0], entry[1]
+        return self._rehydrate(key, user_id)
+
+    def end(self, key):
+        """Forget the session's interview once it is finished or left."""
+        with self._lock:
+            self._live.pop(key, None)
+
+    def hibernate_idle(self):
+        """Hibernate sessions idle for longer than idle_timeout and any beyond max_live."""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        with self._lock:
+            over = len(self._live) - self.max_live
+            for key, (assistant, interview_id, last_used) in list(self._live.items()):
+                if last_used > cutoff and over <= 0:
+                    break
+                if interview_id is None:
+                    continue  # The assistant holds the only copy of the transcript
+                del self._live[key]
+                evicted.append((assistant, interview_id))
+                over -= 1
+        for assistant, interview_id in evicted:
+            self._hibernate(assistant, interview_id)
+        return len(evicted)
+
+    def _hibernate(self, assistant, interview_id):
+        metrics.registry.inc("interview_sessions_total", (("event", "hibernated"),))
+        try:
+            self.db_manager.save_context_notes(interview_id, assistant.context.notes())
+        except Exception:
+            # The notes are rebuilt by summarizing again on the next turn
+            logger.warning("Could not save notes for interview %s", interview_id, exc_info=True)
+
+    def _rehydrate(self, key, user_id):
+        open_interview = self.db_manager.get_open_interview(user_id)
+        if not open_interview or not open_interview[1]:
+            return None, None
+        interview_id, messages = open_interview
+        assistant = self.new_assistant()
+        candidate = self.db_manager.get_candidate_info(user_id)
+        if candidate:
+            assistant.candidate_info = {
+                "experience_years": candidate["experience_years"],
+                "experience_months": candidate["experience_months"],
+                "desired_position": candidate["desired_position"],
+                "tech_stack": candidate["tech_stack"]
+            }
+        assistant.conversation_history = Transcript.from_messages(messages)
+        notes = self.db_manager.get_context_notes(interview_id)
+        # Notes saved before turns that are now missing would skip past the end
+        if notes and notes.get("summarized_upto", 0) <= len(messages):
+            assistant.context.restore(notes)
+        metrics.registry.inc("interview_sessions_total", (("event", "rehydrated"),))
+        self.start(key, assistant, interview_id)
+        return assistant, interview_id
+
+    def live_count(self):
+        with self._lock:
+            return len(self._live)
@@ -0,0 +1,205 @@
+"""Local skill taxonomy used to clean up the tech stack a candidate types in.
+
+Entries are matched against canonical skill names and their aliases,
+ignoring case, spaces, dots and dashes ("reactjs", "React.js" -> React).
+Anything that matches is stored under its canonical name in
+candidates.skills, which admins filter on. Entries the candidate keeps
+as typed are stored too, and the interviewer sees them marked unverified.
+Near misses are offered as suggestions ("Shift: did you
+mean Swift?") rather than replaced, since a close spelling can be a
+different word.
+"""
+import difflib
+import re
+
+# Canonical name -> aliases. The canonical name itself always matches.
+TAXONOMY = {
+    "Python": ["py", "python3"],
+    "Java": ["core java", "java se", "j2ee", "java ee"],
+    "JavaScript": ["js", "ecmascript", "es6", "vanilla js"],
+    "TypeScript": ["ts"],
+    "C": ["c language", "ansi c"],
+    "C++": ["cpp", "cplusplus"],
+    "C#": ["csharp", "c sharp"],
+    "Go": ["golang"],
+    "Rust": ["rustlang"],
+    "Ruby": [],
+    "PHP": [],
+    "Kotlin": [],
+    "Swift": [],
+    "Scala": [],
+    "R": ["r language", "rlang"],
+    "Dart": [],
+    "Bash": ["shell", "shell scripting", "sh"],
+    "SQL": ["structured query language"],
+    "HTML": ["html5"],
+    "CSS": ["css3"],
+    "React": ["reactjs", "react js"],
+    "React Native": ["reactnative"],
+    "Angular": ["angularjs", "angular js"],
+    "Vue.js": ["vue", "vuejs"],
+    "Next.js": ["next", "nextjs"],
+    "Svelte": [],
+    "Redux": [],
+    "Tailwind CSS": ["tailwind"],
+    "Bootstrap": [],
+    "jQuery": [],
+    "Node.js": ["node", "nodejs"],
+    "Express": ["expressjs", "express js"],
+    "Django": [],
+    "Flask": [],
+    "FastAPI": [],
+    "Spring Boot": ["spring", "springboot", "spring framework"],
+    "Ruby on Rails": ["rails", "ror"],
+    "Laravel": [],
+    ".NET": ["dotnet", "asp.net", "asp net", ".net core", "dotnet core"],
+    "Flutter": [],
+    "GraphQL": [],
+    "REST APIs": ["rest", "rest api", "restful", "restful apis"],
+    "gRPC": [],
+    "PostgreSQL": ["postgres", "psql", "pgsql"],
+    "MySQL": [],
+    "SQLite": [],
+    "MongoDB": ["mongo"],
+    "Redis": [],
+    "Cassandra": ["apache cassandra"],
+    "Elasticsearch": ["elastic search", "elastic"],
+    "Oracle Database": ["oracle", "oracle db", "plsql", "pl/sql"],
+    "SQL Server": ["mssql", "ms sql", "microsoft sql server", "t-sql", "tsql"],
+    "DynamoDB": ["dynamo"],
+    "Firebase": [],
+    "Kafka": ["apache kafka"],
+    "RabbitMQ": ["rabbit mq"],
+    "Apache Spark": ["spark", "pyspark"],
+    "Hadoop": ["apache hadoop", "hdfs"],
+    "Airflow": ["apache airflow"],
+    "Docker": ["docker compose", "containers"],
+    "Kubernetes": ["k8s", "kube"],
+    "Terraform": [],
+    "Ansible": [],
+    "Jenkins": [],
+    "GitHub Actions": ["gh actions"],
+    "CI/CD": ["cicd", "ci cd", "continuous integration"],
+    "Git": ["github", "gitlab", "version control"],
+    "Linux": ["unix", "ubuntu"],
+    "AWS": ["amazon web services", "ec2", "s3", "lambda", "aws lambda"],
+    "Azure": ["microsoft azure"],
+    "Google Cloud": ["gcp", "google cloud platform"],
+    "Pandas": [],
+    "NumPy": [],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "TensorFlow": ["tf"],
+    "PyTorch": ["torch"],
+    "Keras": [],
+    "Machine Learning": ["ml"],
+    "Deep Learning": ["dl"],
+    "NLP": ["natural language processing"],
+    "Computer Vision": ["cv", "opencv"],
+    "LLMs": ["llm", "large language models", "genai", "generative ai"],
+    "Data Analysis": ["data analytics"],
+    "Power BI": ["powerbi"],
+    "Tableau": [],
+    "Excel": ["ms excel", "microsoft excel"],
+    "Figma": [],
+    "Selenium": [],
+    "Jest": [],
+    "Pytest": [],
+    "JUnit": [],
+    "Microservices": ["microservice", "micro services"],
+    "System Design": [],
+    "Data Structures": ["dsa", "data structures and algorithms", "algorithms"],
+    "Android": ["android development"],
+    "iOS": ["ios development"],
+}
+
+MAX_SKILL_LENGTH = 40
+# Checkbox on the candidate forms confirming entries outside the taxonomy
+KEEP_UNRECOGNIZED_LABEL = "Keep unrecognised skills as I typed them"
+
+def skill_key(text):
+    """Lowercase with separators removed; '+', '#' and '/' stay since they tell C, C++ and C# apart."""
+    return re.sub(r"[\s.\-_]+", "", text.lower())
+
+class SkillIndex:
+    def __init__(self, taxonomy=TAXONOMY, cutoff=0.8):
+        self.cutoff = cutoff
+        self._keys = {}
+        for canonical, aliases in taxonomy.items():
+            for name in [canonical, *aliases]:
+                self._keys.setdefault(skill_key(name), canonical)
+        # Fuzzy matching only considers longer keys; "go" vs "c" is not a typo
+        self._fuzzy_keys = [key for key in self._keys if len(key) >= 4]
+
+    def canonical_names(self):
+        return sorted(set(self._keys.values()), key=str.lower)
+
+    def match(self, text):
+        """Canonical name for text, or None when it is not in the taxonomy."""
+        return self._keys.get(skill_key(text))
+
+    def suggest(self, text):
+        """The closest canonical name to an unmatched entry, or None."""
+        key = skill_key(text)
+        if len(key) < 4:
+            return None
+        close = difflib.get_close_matches(key, self._fuzzy_keys, n=1, cutoff=self.cutoff)
+        return self._keys[close[0]] if close else None
+
+    def normalize(self, entries):
+        """Clean a tech stack; returns (skills, unrecognized, rejected).
+
+        Known skills get their canonical names and duplicates are dropped.
+        Entries outside the taxonomy are returned as typed in unrecognized,
+        for the candidate to correct or confirm, unless they are not
+        plausibly a skill at all (no letters, or too long to be a name).
+        """
+        skills, unrecognized, rejected, seen = [], [], [], set()
+        for entry in entries:
+            entry = " ".join(entry.split())
+            if not entry or entry.lower() in seen:
+                continue
+            name = self.match(entry)
+            if name is None:
+                if not re.search(r"[a-zA-Z]", entry) or len(entry) > MAX_SKILL_LENGTH:
+                    rejected.append(entry)
+                else:
+                    seen.add(entry.lower())
+                    unrecognized.append(entry)
+            elif name.lower() not in seen:
+                seen.add(name.lower())
+                skills.append(name)
+        return skills, unrecognized, rejected
+
+    def describe_unrecognized(self, entries):
+        """Entries for an error message, with a suggestion where one is close."""
+        described = []
+        for entry in entries:
+            suggestion = self.suggest(entry)
+            described.append(f"{entry} (did you mean {suggestion}?)" if suggestion else entry)
+        return ", ".join(described)
+
+    def known(self, entries):
+        """The canonical names among entries, for candidates.skills."""
+        skills = []
+        for entry in entries or []:
+            name = self.match(entry)
+            if name and name not in skills:
+                skills.append(name)
+        return skills
+
+_index = None
+
+def get_index():
+    global _index
+    if _index is None:
+        _index = SkillIndex()
+    return _index
+
+def parse_tech_stack(text):
+    """Split the comma-separated form field and normalize it; returns (skills, unrecognized, rejected)."""
+    return get_index().normalize(text.split(','))
+
+def stack_to_save(text):
+    """The tech stack as stored once validated: known skills, then the entries the candidate kept as typed."""
+    stack, unrecognized, _ = parse_tech_stack(text)
+    return stack + unrecognized
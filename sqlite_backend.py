@@ -0,0 +1,563 @@
+"""Embedded SQLite storage for DatabaseMan.
+
+Selected with db_backend=sqlite. Everything lives in one local file
+(sqlite_path, default hiring_assistant.sqlite3) opened in WAL mode, so
+reads don't wait on writers or a network round trip. TEXT[] and JSONB
+columns of the Postgres schema are stored as JSON text.
+
+Queries written for Postgres are reused where the SQL is portable: the
+cursor translates %s placeholders and adapts lists and Json parameters.
+Methods relying on Postgres-only SQL are overridden below.
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from psycopg2.extras import Json
+
+import metrics
+import migrations
+from db_utils import DatabaseMan, PoolTimeout, ReadCache, TurnWriter, escape_like
+
+# Declared type JSON makes sqlite3 decode these columns on read
+sqlite3.register_converter("JSON", json.loads)
+
+# Applied in order; PRAGMA user_version records how many have run. A step is
+# a SQL script or, as in migrations.py, a callable taking a cursor
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS candidates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        full_name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        phone TEXT,
+        education TEXT,
+        experience_years INTEGER DEFAULT 0,
+        experience_months INTEGER DEFAULT 0,
+        desired_position TEXT,
+        location TEXT,
+        tech_stack JSON,
+        consent_timestamp TEXT
+    );
+    CREATE TABLE IF NOT EXISTS interviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        conversation_history JSON,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        overall_sentiment TEXT,
+        key_strengths JSON,
+        areas_for_improvement JSON,
+        technical_confidence_score INTEGER,
+        conversation_authenticity_score INTEGER,
+        communication_score INTEGER,
+        evaluation_status TEXT NOT NULL DEFAULT 'done',
+        evaluation_attempts INTEGER NOT NULL DEFAULT 0,
+        evaluation_error TEXT,
+        evaluation_available_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        evaluation_started_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS interview_metrics (
+        interview_id INTEGER PRIMARY KEY REFERENCES interviews(id) ON DELETE CASCADE,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        llm_calls INTEGER NOT NULL DEFAULT 0,
+        llm_seconds REAL NOT NULL DEFAULT 0,
+        prompt_tokens INTEGER NOT NULL DEFAULT 0,
+        completion_tokens INTEGER NOT NULL DEFAULT 0,
+        cache_hits INTEGER NOT NULL DEFAULT 0,
+        db_calls INTEGER NOT NULL DEFAULT 0,
+        db_seconds REAL NOT NULL DEFAULT 0,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS interview_turns (
+        interview_id INTEGER NOT NULL REFERENCES interviews(id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (interview_id, seq)
+    );
+    CREATE INDEX IF NOT EXISTS candidates_user_id_idx ON candidates (user_id);
+    CREATE INDEX IF NOT EXISTS interviews_user_id_idx ON interviews (user_id, id);
+    CREATE INDEX IF NOT EXISTS users_role_idx ON users (role);
+    CREATE INDEX IF NOT EXISTS candidates_full_name_idx ON candidates (full_name, user_id);
+    CREATE INDEX IF NOT EXISTS candidates_desired_position_idx
+        ON candidates (COALESCE(desired_position, ''), user_id);
+    CREATE INDEX IF NOT EXISTS interviews_evaluation_queue_idx
+        ON interviews (id) WHERE evaluation_status IN ('pending', 'running');
+    CREATE INDEX IF NOT EXISTS interviews_in_progress_idx
+        ON interviews (user_id, id) WHERE evaluation_status = 'in_progress';
+    """,
+    "ALTER TABLE candidates ADD COLUMN skills JSON NOT NULL DEFAULT '[]';",
+    migrations.backfill_candidate_skills,
+    """
+    CREATE TABLE IF NOT EXISTS question_bank (
+        position_key TEXT NOT NULL,
+        skill TEXT NOT NULL,
+        experience_bucket TEXT NOT NULL,
+        position_label TEXT,
+        opener TEXT NOT NULL,
+        generated_at REAL NOT NULL,
+        PRIMARY KEY (position_key, skill, experience_bucket)
+    );
+    """,
+    # FTS5 index of transcripts, kept in step with interviews by triggers;
+    # the rowid is the interview id and porter stemming matches Postgres' english config
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS interview_search
+        USING fts5(candidate_text, interviewer_text, tokenize = 'porter unicode61');
+    CREATE TRIGGER IF NOT EXISTS interviews_search_insert AFTER INSERT ON interviews BEGIN
+        INSERT INTO interview_search (rowid, candidate_text, interviewer_text)
+        SELECT NEW.id,
+               (SELECT group_concat(json_extract(value, '$.content'), ' ') FROM json_each(NEW.conversation_history)
+                WHERE json_extract(value, '$.role') = 'user'),
+               (SELECT group_concat(json_extract(value, '$.content'), ' ') FROM json_each(NEW.conversation_history)
+                WHERE json_extract(value, '$.role') = 'assistant')
+        WHERE json_type(NEW.conversation_history) = 'array';
+    END;
+    CREATE TRIGGER IF NOT EXISTS interviews_search_update AFTER UPDATE OF conversation_history ON interviews BEGIN
+        DELETE FROM interview_search WHERE rowid = OLD.id;
+        INSERT INTO interview_search (rowid, candidate_text, interviewer_text)
+        SELECT NEW.id,
+               (SELECT group_concat(json_extract(value, '$.content'), ' ') FROM json_each(NEW.conversation_history)
+                WHERE json_extract(value, '$.role') = 'user'),
+               (SELECT group_concat(json_extract(value, '$.content'), ' ') FROM json_each(NEW.conversation_history)
+                WHERE json_extract(value, '$.role') = 'assistant')
+        WHERE json_type(NEW.conversation_history) = 'array';
+    END;
+    CREATE TRIGGER IF NOT EXISTS interviews_search_delete AFTER DELETE ON interviews BEGIN
+        DELETE FROM interview_search WHERE rowid = OLD.id;
+    END;
+    UPDATE interviews SET conversation_history = conversation_history WHERE conversation_history IS NOT NULL;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS candidate_scores (
+        user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        interview_id INTEGER NOT NULL REFERENCES interviews(id) ON DELETE CASCADE,
+        technical_confidence_score INTEGER,
+        communication_score INTEGER,
+        conversation_authenticity_score INTEGER,
+        overall_sentiment TEXT,
+        evaluated_at TEXT
+    );
+    """,
+    migrations.backfill_candidate_scores,
+    "ALTER TABLE interviews ADD COLUMN context_notes JSON;",
+]
+
+def _statements(script):
+    """Split a script into statements; trigger bodies contain semicolons of their own."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ""
+    if statement.strip():
+        yield statement
+
+def _adapt(value):
+    if isinstance(value, Json):
+        return json.dumps(value.adapted)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+def _json(value):
+    # Expressions and RETURNING columns carry no declared type, so they arrive as text
+    return json.loads(value) if isinstance(value, str) else value
+
+class _Cursor:
+    """sqlite3 cursor that accepts the psycopg2 parameter style."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace("%s", "?"), [_adapt(value) for value in params])
+        return self
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(query.replace("%s", "?"), ([_adapt(value) for value in row] for row in rows))
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+class SQLiteDatabaseMan(DatabaseMan):
+    def __init__(self, path=None, minconn=None, maxconn=None, checkout_timeout=None):
+        self.path = path or os.getenv('sqlite_path', 'hiring_assistant.sqlite3')
+        # maxconn bounds open connections; WAL lets readers run next to the single writer
+        self.maxconn = int(maxconn or os.getenv('db_pool_max', 10))
+        self.checkout_timeout = float(checkout_timeout or os.getenv('db_pool_timeout', 10))
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._idle = []
+        self._all = []
+        self._lock = threading.Lock()
+        self.read_cache = ReadCache(float(os.getenv('db_read_cache_ttl', 60)))
+        self._candidate_columns = None
+        self.turn_writer = TurnWriter(self)
+        try:
+            self._migrate()
+        except Exception as e:
+            raise Exception(f"Database connection error: {e}")
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.checkout_timeout, isolation_level=None,
+                               detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Durable at checkpoints rather than every commit, which is safe in WAL mode
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _migrate(self):
+        with self.connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for index, step in enumerate(SCHEMA[version:], start=version + 1):
+                if callable(step):
+                    step(_Cursor(conn.cursor()))
+                else:
+                    for statement in _statements(step):
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {index}")
+
+    @contextmanager
+    def connection(self):
+        """One transaction on a connection from the local pool."""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+        conn = None
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._open()
+                with self._lock:
+                    self._all.append(conn)
+            conn.execute("BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # Includes GeneratorExit from a streaming generator closed early
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._idle.append(conn)
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield _Cursor(cursor)
+            finally:
+                cursor.close()
+
+    def close(self):
+        self.turn_writer.stop()
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all, self._idle = [], []
+
+    def candidate_columns(self):
+        if self._candidate_columns is None:
+            with self.cursor() as cursor:
+                cursor.execute("PRAGMA table_info(candidates)")
+                self._candidate_columns = [row[1] for row in cursor.fetchall()]
+        return self._candidate_columns
+
+    def _write_turns(self, turns):
+        with self.cursor() as cursor:
+            cursor.executemany("""
+                INSERT INTO interview_turns (interview_id, seq, role, content) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (interview_id, seq) DO NOTHING
+                """, turns)
+
+    TRANSCRIPT_FROM_TURNS = """
+        (SELECT COALESCE(json_group_array(json_object('role', role, 'content', content)), '[]')
+         FROM (SELECT role, content FROM interview_turns WHERE interview_id = %s ORDER BY seq))
+    """
+
+    ABANDON_EXHAUSTED_QUERY = """
+    UPDATE interviews
+    SET evaluation_status = 'failed',
+        evaluation_error = 'Evaluation did not finish in ' || evaluation_attempts || ' attempts'
+    WHERE evaluation_status = 'running'
+      AND evaluation_started_at < datetime('now', %s)
+      AND evaluation_attempts >= %s
+    """
+
+    def claim_evaluation(self, lease_seconds=600, max_running=None, max_attempts=None):
+        # A single UPDATE is atomic under SQLite's one-writer lock, so no row locks are needed
+        query = """
+        UPDATE interviews
+        SET evaluation_status = 'running',
+            evaluation_attempts = evaluation_attempts + 1,
+            evaluation_started_at = CURRENT_TIMESTAMP
+        WHERE id = (
+            SELECT id FROM interviews
+            WHERE (evaluation_status = 'pending' AND evaluation_available_at <= CURRENT_TIMESTAMP)
+               OR (evaluation_status = 'running' AND evaluation_started_at < datetime('now', %s))
+            ORDER BY id
+            LIMIT 1
+        )
+        AND (SELECT COUNT(*) FROM interviews
+             WHERE evaluation_status = 'running' AND evaluation_started_at >= datetime('now', %s)) < %s
+        RETURNING id, user_id, conversation_history, evaluation_attempts
+        """
+        lease = f"-{int(lease_seconds)} seconds"
+        with self.cursor() as cursor:
+            if max_attempts:
+                cursor.execute(self.ABANDON_EXHAUSTED_QUERY, (lease, max_attempts))
+            cursor.execute(query, (lease, lease, max_running or 2 ** 31))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], _json(row[2]), row[3]
+
+    def iter_interviews(self, after_id=0, statuses=None, batch_size=500):
+        conditions = ["id > %s", "conversation_history IS NOT NULL"]
+        params = [after_id]
+        if statuses:
+            conditions.append(f"evaluation_status IN ({', '.join(['%s'] * len(statuses))})")
+            params.extend(statuses)
+        query = f"""
+        SELECT id, user_id, conversation_history
+        FROM interviews
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id
+        """
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def existing_accounts(self, usernames, emails):
+        with self.cursor() as cursor:
+            cursor.execute("SELECT username FROM users WHERE username IN (SELECT value FROM json_each(%s))",
+                           (list(usernames),))
+            taken_usernames = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT email FROM candidates WHERE email IN (SELECT value FROM json_each(%s))",
+                           (list(emails),))
+            taken_emails = {row[0] for row in cursor.fetchall()}
+        return taken_usernames, taken_emails
+
+    def import_candidates(self, candidates, role='Candidate'):
+        if not candidates:
+            return []
+        ids = []
+        with self.cursor() as cursor:
+            for username, password_hash, _ in candidates:
+                cursor.execute("INSERT INTO users (username, password, role) VALUES (%s, %s, %s)",
+                               (username, password_hash, role))
+                ids.append(cursor.lastrowid)
+            cursor.executemany("""
+                INSERT INTO candidates (user_id, full_name, email, phone, education, experience_years, experience_months, desired_position, location, tech_stack, consent_timestamp, skills)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, [self._candidate_values(user_id, candidate_data)
+                      for user_id, (_, _, candidate_data) in zip(ids, candidates)])
+        return ids
+
+    def iter_batches(self, query, params=(), batch_size=1000):
+        # A WAL read transaction gives the same consistent, incremental read as a named cursor
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    def save_evaluations(self, evaluations):
+        if not evaluations:
+            return
+        query = """
+        UPDATE interviews
+        SET overall_sentiment = %s, key_strengths = %s, areas_for_improvement = %s,
+            technical_confidence_score = %s, conversation_authenticity_score = %s,
+            communication_score = %s, evaluation_status = 'done', evaluation_error = NULL
+        WHERE id = %s
+        """
+        with self.cursor() as cursor:
+            cursor.executemany(query, [(
+                sentiment_data.get('overall_sentiment'),
+                sentiment_data.get('key_strengths'),
+                sentiment_data.get('areas_for_improvement'),
+                sentiment_data.get('technical_confidence_score'),
+                sentiment_data.get('conversation_authenticity_score'),
+                sentiment_data.get('communication_score'),
+                interview_id
+            ) for interview_id, sentiment_data in evaluations])
+            self._refresh_candidate_scores(cursor, [interview_id for interview_id, _ in evaluations])
+
+    def fail_evaluation(self, interview_id, error, retry_in=None):
+        if retry_in is None:
+            query = "UPDATE interviews SET evaluation_status = 'failed', evaluation_error = %s WHERE id = %s"
+            params = (error, interview_id)
+        else:
+            query = """
+            UPDATE interviews
+            SET evaluation_status = 'pending', evaluation_error = %s,
+                evaluation_available_at = datetime('now', %s)
+            WHERE id = %s
+            """
+            params = (error, f"+{float(retry_in)} seconds", interview_id)
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
+
+    USER_PAGE_SORT_COLUMNS = DatabaseMan.USER_PAGE_SORT_COLUMNS
+
+    def fetch_user_page(self, name=None, position=None, role='Candidate', sort_by='full_name',
+                        descending=False, after=None, limit=25, skills=None):
+        if sort_by not in self.USER_PAGE_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort candidates by {sort_by}")
+        sort_column = self.USER_PAGE_SORT_COLUMNS[sort_by]
+        direction = "DESC" if descending else "ASC"
+
+        # LIKE is case-insensitive for ASCII in SQLite, matching ILIKE closely enough
+        conditions, params = [], []
+        if role:
+            conditions.append("u.role = %s")
+            params.append(role)
+        if name:
+            conditions.append("c.full_name LIKE %s ESCAPE '\\'")
+            params.append(f"%{escape_like(name)}%")
+        if position:
+            conditions.append("c.desired_position LIKE %s ESCAPE '\\'")
+            params.append(f"%{escape_like(position)}%")
+        if skills:
+            skills = list(dict.fromkeys(skills))
+            conditions.append(f"""(SELECT COUNT(DISTINCT value) FROM json_each(c.skills)
+                                   WHERE value IN ({', '.join(['%s'] * len(skills))})) = %s""")
+            params.extend([*skills, len(skills)])
+        if after is not None:
+            conditions.append(f"({sort_column}, u.id) {'<' if descending else '>'} (%s, %s)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        query = f"""
+        SELECT c.full_name, c.desired_position, u.id,
+               i.overall_sentiment, i.technical_confidence_score, i.communication_score,
+               i.conversation_authenticity_score, i.evaluation_status,
+               {sort_column}
+        FROM candidates c
+        JOIN users u ON c.user_id = u.id
+        LEFT JOIN interviews i ON i.id = (SELECT MAX(id) FROM interviews WHERE user_id = u.id)
+        {where}
+        ORDER BY {sort_column} {direction}, u.id {direction}
+        LIMIT %s
+        """
+        params.append(limit + 1)
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][-1], rows[-1][2])
+        return [row[:-1] for row in rows], next_cursor
+
+    def search_interviews(self, query, after=None, limit=20):
+        # Every word must match, taken literally rather than as FTS5 syntax
+        terms = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+        if not terms:
+            return [], None
+        conditions, params = [], [terms]
+        if after is not None:
+            conditions.append("(h.rank, h.id) < (%s, %s)")
+            params.extend(after)
+        params.append(limit + 1)
+        sql = f"""
+        SELECT h.id, i.user_id, c.full_name, c.desired_position, h.rank, h.snippet
+        FROM (
+            SELECT rowid AS id,
+                   -bm25(interview_search, 2.0, 1.0) AS rank,
+                   snippet(interview_search, -1, '**', '**', ' ... ', 16) AS snippet
+            FROM interview_search
+            WHERE interview_search MATCH %s
+        ) h
+        JOIN interviews i ON i.id = h.id
+        LEFT JOIN candidates c ON c.user_id = i.user_id
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY h.rank DESC, h.id DESC
+        LIMIT %s
+        """
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][4], rows[-1][0])
+        return rows, next_cursor
+
+    def fetch_candidate_scores(self, position=None):
+        conditions, params = [], []
+        if position:
+            conditions.append("c.desired_position LIKE %s ESCAPE '\\'")
+            params.append(f"%{escape_like(position)}%")
+        query = f"""
+        SELECT s.user_id, c.full_name, c.desired_position, s.technical_confidence_score,
+               s.communication_score, s.conversation_authenticity_score,
+               s.overall_sentiment, s.evaluated_at
+        FROM candidate_scores s
+        JOIN candidates c ON c.user_id = s.user_id
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        """
+        with self.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def fetch_interview_evaluations(self, user_ids):
+        if not user_ids:
+            return {}
+        user_ids = list(user_ids)
+        query = f"""
+            SELECT user_id, overall_sentiment, key_strengths, technical_confidence_score,
+                   conversation_authenticity_score, communication_score, areas_for_improvement,
+                   evaluation_status, evaluation_error
+            FROM interviews
+            WHERE id IN (SELECT MAX(id) FROM interviews
+                         WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})
+                         GROUP BY user_id)
+            """
+        with self.cursor() as cursor:
+            cursor.execute(query, user_ids)
+            rows = cursor.fetchall()
+        return {
+            row[0]: {
+            "Overall Sentiment": row[1],
+            "Key Strengths": row[2],
+            "Technical Confidence Score": row[3],
+            "Conversation Authenticity Score": row[4] if row[4] is not None else "Not Evaluated",
+            "Communication Score": row[5],
+            "Areas for Improvement": row[6],
+            "Evaluation Status": row[7],
+            "Evaluation Error": row[8]
+            }
+            for row in rows
+        }
+
+metrics.instrument_methods(SQLiteDatabaseMan, skip=('connection', 'cursor', 'close'))
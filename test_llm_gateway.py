@@ -0,0 +1,82 @@
+"""LLM gateway admission, end to end against the fake OpenAI server.
+
+    python -m pytest test_llm_gateway.py
+"""
+import threading
+import time
+
+import pytest
+from openai import OpenAI
+
+import fake_openai
+import llm_gateway
+import utils
+from llm_gateway import BACKGROUND, INTERACTIVE, LLMGateway
+
+MESSAGES = [{"role": "user", "content": "Tell me about a recent project."}]
+
+
+@pytest.fixture
+def fake():
+    fake = fake_openai.FakeOpenAI(latency=0.02, jitter=0)
+    server = fake_openai.serve(fake, port=0)
+    fake.client = OpenAI(api_key="fake", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+                         max_retries=0)
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+def use_gateway(monkeypatch, gateway):
+    monkeypatch.setattr(utils, "_gateway", gateway)
+    monkeypatch.setattr(utils, "_gateway_ready", True)
+    # Every call has to reach the gateway
+    monkeypatch.setattr(utils, "_response_cache", None)
+    monkeypatch.setattr(utils, "_response_cache_ready", True)
+
+def wait_until_queued(gateway, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while gateway.stats()["queued"] < count:
+        assert time.monotonic() < deadline, "calls never reached the gateway"
+        time.sleep(0.005)
+
+def test_interactive_calls_go_ahead_of_background(monkeypatch, fake):
+    # Two requests a second, starting with none to spare, so every call queues
+    gateway = LLMGateway(rpm=120, tpm=10 ** 6)
+    gateway.requests.tokens = 0
+    use_gateway(monkeypatch, gateway)
+    finished, lock = [], threading.Lock()
+
+    def call(name, priority):
+        utils.generate_openai_response(fake.client, MESSAGES, priority=priority, call_site="test")
+        with lock:
+            finished.append(name)
+
+    threads = [threading.Thread(target=call, args=(f"background{n}", BACKGROUND)) for n in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_until_queued(gateway, 3)
+    for n in range(2):
+        threads.append(threading.Thread(target=call, args=(f"interactive{n}", INTERACTIVE)))
+        threads[-1].start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert sorted(finished[:2]) == ["interactive0", "interactive1"]
+    assert sorted(finished[2:]) == ["background0", "background1", "background2"]
+    assert gateway.stats()["admitted"] == {INTERACTIVE: 2, BACKGROUND: 3}
+    assert fake.requests == 5
+
+def test_saturated_gateway_sheds_with_wait_estimate(monkeypatch, fake):
+    # One request a second and none to spare: the next slot is a second away
+    gateway = LLMGateway(rpm=60, tpm=10 ** 6, max_wait={INTERACTIVE: 0.5, BACKGROUND: 0.5})
+    gateway.requests.tokens = 0
+    use_gateway(monkeypatch, gateway)
+
+    with pytest.raises(utils.LLMOverloadedError) as shed:
+        utils.generate_openai_response(fake.client, MESSAGES, call_site="test")
+
+    assert isinstance(shed.value.__cause__, llm_gateway.GatewayOverloaded)
+    assert 0.5 < shed.value.wait_estimate <= 1.0
+    assert gateway.stats()["shed"] == {INTERACTIVE: 1, BACKGROUND: 0}
+    # Turned away before spending quota
+    assert fake.requests == 0
@@ -0,0 +1,54 @@
+"""Compact in-memory interview transcript.
+
+The chat UI and the HiringAssistant share one Transcript per interview
+rather than each keeping its own list of message dicts. Turns are slotted
+records, a fraction of the size of a dict, but still read like the
+{"role": ..., "content": ...} messages the rest of the code, the database
+and the API use.
+"""
+import sys
+
+
+class Turn:
+    __slots__ = ("role", "content")
+
+    def __init__(self, role, content):
+        # There are only a few roles, so every turn points at the same strings
+        self.role = sys.intern(role)
+        self.content = content
+
+    def __getitem__(self, key):
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def keys(self):
+        return ("role", "content")
+
+    def __eq__(self, other):
+        if isinstance(other, (Turn, dict)):
+            return self.role == other["role"] and self.content == other["content"]
+        return NotImplemented
+
+    def __repr__(self):
+        # Same text as the equivalent dict, which the evaluation prompt embeds
+        return repr({"role": self.role, "content": self.content})
+
+class Transcript(list):
+    """A conversation as a list of Turns, oldest first."""
+    __slots__ = ()
+
+    @classmethod
+    def from_messages(cls, messages):
+        return cls(Turn(message["role"], message["content"]) for message in messages or [])
+
+    def add(self, role, content):
+        turn = Turn(role, content)
+        self.append(turn)
+        return turn
+
+    def to_dicts(self):
+        """Plain dicts, for JSON columns and API requests."""
+        return [{"role": turn.role, "content": turn.content} for turn in self]
@@ -1,18 +1,188 @@
+import openai
 from openai import OpenAI
+from openai.types.chat import ChatCompletionMessage
+import httpx
 import os
+import random
+import threading
+import time
 from dotenv import load_dotenv
 import re
+import json
 from dataclasses import dataclass, asdict
 from typing import List
+import llm_cache
+import llm_gateway
+import skills
+import metrics
+from llm_gateway import INTERACTIVE
+
+class LLMError(Exception):
+    """An OpenAI call failed after retries."""
+
+class LLMTimeoutError(LLMError):
+    pass
+
+class LLMConnectionError(LLMError):
+    pass
+
+class LLMRateLimitError(LLMError):
+    pass
+
+class LLMOverloadedError(LLMError):
+    """The gateway shed this call; wait_estimate says roughly when to retry, in seconds."""
+
+    def __init__(self, message, wait_estimate):
+        super().__init__(message)
+        self.wait_estimate = wait_estimate
+
+class LLMResponseError(LLMError):
+    """The API rejected the request; retrying would not help."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+_client = None
+_client_lock = threading.Lock()
 
 def open_ai_config():
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-    return client
+    """Process-wide OpenAI client, built once with keep-alive and timeouts.
+
+    Retries are handled by call_with_retries, so the SDK's own are disabled.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            load_dotenv()
+            api_key = os.getenv("OPENAI_API_KEY")
+            timeout = httpx.Timeout(float(os.getenv('openai_read_timeout', 60)),
+                                    connect=float(os.getenv('openai_connect_timeout', 5)))
+            http_client = httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=int(os.getenv('openai_max_connections', 20)),
+                                    max_keepalive_connections=int(os.getenv('openai_max_connections', 20)),
+                                    keepalive_expiry=60)
+            )
+            _client = OpenAI(api_key=api_key, http_client=http_client, timeout=timeout, max_retries=0)
+        return _client
+
+def _parse_duration(value):
+    """Seconds in a rate-limit reset header such as '1s', '6m0s' or '20ms'."""
+    seconds = 0.0
+    for amount, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds or None
+
+def retry_after(error):
+    """Delay the server asked for in a 429/503 response, if any."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+    for header in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens'):
+        if headers.get(header):
+            return _parse_duration(headers[header])
+    return None
+
+def call_with_retries(call, max_retries=None, base_delay=0.5, max_delay=30):
+    """Run call(), retrying transient OpenAI failures with jittered exponential backoff.
+
+    Rate-limit headers take precedence over the computed delay. Failures are
+    re-raised as LLMError subclasses.
+    """
+    if max_retries is None:
+        max_retries = int(os.getenv('openai_max_retries', 3))
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except openai.APITimeoutError as e:
+            cause, error = e, LLMTimeoutError(f"OpenAI request timed out: {e}")
+        except openai.APIConnectionError as e:
+            cause, error = e, LLMConnectionError(f"Could not reach OpenAI: {e}")
+        except openai.RateLimitError as e:
+            cause, error = e, LLMRateLimitError(f"OpenAI rate limit hit: {e}")
+        except openai.InternalServerError as e:
+            cause, error = e, LLMResponseError(f"OpenAI server error: {e}", e.status_code)
+        except openai.APIStatusError as e:
+            raise LLMResponseError(f"OpenAI rejected the request: {e}", e.status_code) from e
+        if attempt == max_retries:
+            raise error from cause
+        delay = retry_after(cause)
+        if delay is None:
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+        time.sleep(min(delay, max_delay))
+
+_gateway = None
+_gateway_ready = False
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """Process-wide LLMGateway every OpenAI call goes through, or None when disabled."""
+    global _gateway, _gateway_ready
+    with _gateway_lock:
+        if not _gateway_ready:
+            _gateway = llm_gateway.gateway_from_env()
+            _gateway_ready = True
+        return _gateway
+
+def estimate_tokens(messages, functions=None):
+    """Rough token cost of a call: the prompt plus an allowance for the reply."""
+    from conversation_context import count_message_tokens  # imports utils itself
+    prompt = count_message_tokens(messages)
+    if functions:
+        prompt += len(json.dumps(functions)) // 4
+    return prompt + int(os.getenv('llm_expected_completion_tokens', 400))
+
+def _create_completion(client, kwargs, priority, estimated_tokens):
+    """One admitted API call: wait for gateway capacity, then call OpenAI."""
+    gateway = get_gateway()
+    reservation = None
+    if gateway is not None:
+        try:
+            reservation = gateway.acquire(estimated_tokens, priority)
+        except llm_gateway.GatewayOverloaded as e:
+            raise LLMOverloadedError(str(e), e.wait_estimate) from e
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except openai.RateLimitError as e:
+        if gateway is not None:
+            gateway.penalize(retry_after(e) or 1.0)
+        raise
+    if reservation is not None and not kwargs.get("stream") and response.usage:
+        gateway.settle(reservation, response.usage.total_tokens)
+    return response, reservation
+
+_response_cache = None
+_response_cache_ready = False
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Process-wide response cache, built from the environment on first use."""
+    global _response_cache, _response_cache_ready
+    with _response_cache_lock:
+        if not _response_cache_ready:
+            _response_cache = llm_cache.cache_from_env()
+            _response_cache_ready = True
+        return _response_cache
+
+def set_response_cache(cache):
+    """Swap in another cache (anything with get/set), or None to disable caching."""
+    global _response_cache, _response_cache_ready
+    with _response_cache_lock:
+        _response_cache = cache
+        _response_cache_ready = True
 
 def generate_openai_response(client, messages, model='gpt-3.5-turbo',temperature = 0.1, 
-                        functions = None, function_call= None):
+                        functions = None, function_call= None, use_cache=True, priority=INTERACTIVE,
+                        call_site='unknown'):
     kwargs = {
         "model": model,
         "messages": messages,
@@ -24,21 +194,171 @@ def generate_openai_response(client, messages, model='gpt-3.5-turbo',temperature
     if function_call:
         kwargs["function_call"] = function_call
 
+    started = time.perf_counter()
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = llm_cache.cache_key(model, messages, temperature, functions, function_call)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.record_llm(call_site, time.perf_counter() - started, cache="hit")
+            return ChatCompletionMessage.model_validate(cached)
+
+    # Each retry is admitted by the gateway again, since it spends quota too
+    estimated_tokens = estimate_tokens(messages, functions)
     try:
-        response = client.chat.completions.create(**kwargs)
-        return response.choices[0].message
+        response, _ = call_with_retries(lambda: _create_completion(client, kwargs, priority, estimated_tokens))
     except Exception as e:
-        print(f"Error in OpenAI API call: {e}")
-        return None
+        metrics.record_llm(call_site, time.perf_counter() - started,
+                           cache="miss" if cache is not None else "off", error=type(e).__name__)
+        raise
+    message = response.choices[0].message
+    usage = response.usage
+    metrics.record_llm(call_site, time.perf_counter() - started,
+                       prompt_tokens=usage.prompt_tokens if usage else 0,
+                       completion_tokens=usage.completion_tokens if usage else 0,
+                       cache="miss" if cache is not None else "off")
+    if cache is not None:
+        cache.set(key, message.model_dump(exclude_none=True))
+    return message
+
+def stream_openai_response(client, messages, model='gpt-3.5-turbo', temperature = 0.1,
+                        functions = None, function_call= None, use_cache=True, priority=INTERACTIVE,
+                        call_site='unknown'):
+    """Yield the assistant reply as text deltas while the completion streams in.
+
+    When a function call is requested the deltas are fragments of the
+    function call's JSON arguments instead of message content. A cached
+    reply is yielded in one piece.
+    """
+    kwargs = {
+        "model": model,
+        "messages": messages,
+        'temperature': temperature,
+        "stream": True,
+        # The final chunk then reports token usage for the gateway
+        "stream_options": {"include_usage": True}
+    }
     
-def validate_inputs(full_name, email, phone, desired_position, location, tech_stack):
-    """Validate all form inputs."""
+    if functions:
+        kwargs["functions"] = functions
+    if function_call:
+        kwargs["function_call"] = function_call
+
+    started = time.perf_counter()
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = llm_cache.cache_key(model, messages, temperature, functions, function_call)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.record_llm(call_site, time.perf_counter() - started, cache="hit")
+            if cached.get("function_call"):
+                yield cached["function_call"]["arguments"]
+            elif cached.get("content"):
+                yield cached["content"]
+            return
+
+    content, arguments, function_name, usage = [], [], None, None
+    cache_status = "miss" if cache is not None else "off"
+    # Time spent in the consumer between chunks (e.g. Streamlit rendering) is not LLM time
+    consumer_seconds = 0.0
+    # Only opening the stream is retried; text already shown can't be taken back
+    estimated_tokens = estimate_tokens(messages, functions)
+    try:
+        stream, reservation = call_with_retries(lambda: _create_completion(client, kwargs, priority, estimated_tokens))
+        first_token = True
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+                if reservation is not None:
+                    get_gateway().settle(reservation, usage.total_tokens)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            text = None
+            if delta.function_call:
+                function_name = function_name or delta.function_call.name
+                if delta.function_call.arguments:
+                    arguments.append(delta.function_call.arguments)
+                    text = delta.function_call.arguments
+            elif delta.content:
+                content.append(delta.content)
+                text = delta.content
+            if text:
+                if first_token:
+                    metrics.registry.observe("llm_first_token_seconds", (("call_site", call_site),),
+                                             time.perf_counter() - started)
+                    first_token = False
+                paused = time.perf_counter()
+                yield text
+                consumer_seconds += time.perf_counter() - paused
+    except (openai.APIError, httpx.HTTPError) as e:
+        metrics.record_llm(call_site, time.perf_counter() - started - consumer_seconds,
+                           cache=cache_status, error="LLMConnectionError")
+        raise LLMConnectionError(f"OpenAI stream interrupted: {e}") from e
+    except LLMError as e:
+        metrics.record_llm(call_site, time.perf_counter() - started - consumer_seconds,
+                           cache=cache_status, error=type(e).__name__)
+        raise
+    metrics.record_llm(call_site, time.perf_counter() - started - consumer_seconds,
+                       prompt_tokens=usage.prompt_tokens if usage else 0,
+                       completion_tokens=usage.completion_tokens if usage else 0,
+                       cache=cache_status)
+
+    if cache is not None:
+        # Store the same shape generate_openai_response caches
+        message = {"role": "assistant", "content": "".join(content) or None}
+        if function_name:
+            message["function_call"] = {"name": function_name, "arguments": "".join(arguments)}
+        cache.set(key, message)
+
+def partial_json_string(buffer, key):
+    """Decoded prefix of the string value stored under key in a possibly incomplete JSON object.
+
+    Used to show a function call's text argument while its JSON is still streaming.
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), buffer)
+    if not match:
+        return ""
+    raw = buffer[match.end():]
+    end = i = 0
+    while i < len(raw):
+        if raw[i] == '\\':
+            # Only consume escape sequences that have fully arrived
+            width = 6 if raw[i + 1:i + 2] == 'u' else 2
+            if i + width > len(raw):
+                break
+            i += width
+        elif raw[i] == '"':
+            break
+        else:
+            i += 1
+        end = i
+    value = json.loads('"' + raw[:end] + '"')
+    # Hold back half of a surrogate pair until its partner arrives
+    if value and '\ud800' <= value[-1] <= '\udbff':
+        value = value[:-1]
+    return value
+    
+def validate_inputs(full_name, email, phone, desired_position, location, tech_stack, keep_unrecognized=False):
+    """Validate all form inputs.
+
+    Tech stack entries outside the skill taxonomy are flagged unless the
+    candidate has confirmed them with keep_unrecognized.
+    """
     if not all([full_name, email, phone, desired_position, location, tech_stack]):
         return False, "Please fill in all required fields."
     if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
         return False, "Invalid email address. Please enter a valid email."
     if not re.match(r"^\d{10}$", phone):
         return False, "Invalid phone number. Please enter a valid 10-digit phone number."
+    stack, unrecognized, rejected = skills.parse_tech_stack(tech_stack)
+    if rejected:
+        return False, f"These don't look like skills: {', '.join(rejected)}. Please list technologies separated by commas."
+    if unrecognized and not keep_unrecognized:
+        return False, (f"We don't recognise: {skills.get_index().describe_unrecognized(unrecognized)}. "
+                       f"Please correct or remove them, or tick \"{skills.KEEP_UNRECOGNIZED_LABEL}\".")
+    if not stack and not unrecognized:
+        return False, "Please list at least one technology in your tech stack."
     return True, ""
 
 @dataclass